@@ -0,0 +1,179 @@
+# Polychromatic is licensed under the GPLv3.
+# Copyright (C) 2020-2024 Luke Horwell <code@horwell.me>
+"""
+Easing curves and tweens for animating software effects, such as fading
+between colours or "breathing" a set of keys.
+
+Curves are sampled once for the number of frames an animation lasts and kept,
+so playing an animation only needs to look up the next value. Tweens apply
+a curve to whole arrays of RGB values at once, indexed as [..., (red, green, blue)].
+
+For example, to fade a 6x22 keyboard from black to white over 2 seconds:
+
+    tween = animation.Tween(np.zeros((6, 22, 3)), [255, 255, 255], 2, FPS, "sine_in_out")
+    fx.blit(tween.get_frame(frame))
+"""
+
+import functools
+
+import numpy as np
+
+# Tween repeat modes
+REPEAT_NONE = 0         # Stay on the last frame
+REPEAT_LOOP = 1         # Start again from the beginning
+REPEAT_REVERSE = 2      # Play backwards, then forwards again
+
+# Number of curves to keep for get_curve()
+CURVE_CACHE_SIZE = 64
+
+
+def _ease_sine(t):
+    return 1 - np.cos(t * np.pi / 2)
+
+
+def _ease_quad(t):
+    return t ** 2
+
+
+def _ease_cubic(t):
+    return t ** 3
+
+
+def _ease_expo(t):
+    return np.where(t == 0, 0, 2 ** (10 * t - 10))
+
+
+def _ease_back(t):
+    return 2.70158 * t ** 3 - 1.70158 * t ** 2
+
+
+def _ease_bounce(t):
+    # Bounces towards the start, as the "out" curve bounces at the end
+    t = 1 - t
+    return 1 - np.select(
+        [t < 1 / 2.75, t < 2 / 2.75, t < 2.5 / 2.75],
+        [7.5625 * t ** 2, 7.5625 * (t - 1.5 / 2.75) ** 2 + 0.75, 7.5625 * (t - 2.25 / 2.75) ** 2 + 0.9375],
+        7.5625 * (t - 2.625 / 2.75) ** 2 + 0.984375)
+
+
+def _get_easings():
+    """
+    Returns a dictionary of easing functions, with "in", "out" and "in_out"
+    variations of each curve.
+    """
+    easings = {"linear": lambda t: t}
+
+    for name, ease_in in [("sine", _ease_sine), ("quad", _ease_quad), ("cubic", _ease_cubic),
+                          ("expo", _ease_expo), ("back", _ease_back), ("bounce", _ease_bounce)]:
+        easings[name + "_in"] = ease_in
+        easings[name + "_out"] = lambda t, ease_in=ease_in: 1 - ease_in(1 - t)
+        easings[name + "_in_out"] = lambda t, ease_in=ease_in: np.where(t < 0.5, ease_in(2 * t) / 2, 1 - ease_in(2 - 2 * t) / 2)
+
+    return easings
+
+
+# Functions taking an array of progress (0 to 1) and returning the eased
+# values, which start at 0 and end at 1 (but may overshoot, e.g. "back")
+EASINGS = _get_easings()
+
+
+def get_frame_count(duration, fps):
+    """
+    Returns the number of frames for an animation lasting 'duration' seconds,
+    including the first and last frame.
+    """
+    return max(int(round(duration * fps)), 0) + 1
+
+
+@functools.lru_cache(maxsize=CURVE_CACHE_SIZE)
+def get_curve(easing="linear", frames=60):
+    """
+    Returns a read-only array of the easing curve sampled for each frame of an
+    animation. The first frame is 0 and the last frame is 1.
+
+    Params:
+        easing      (str)   Key from EASINGS, e.g. "sine_in_out"
+        frames      (int)   Number of frames, see get_frame_count()
+    """
+    if frames < 2:
+        curve = np.ones(max(frames, 1), dtype=np.float32)
+    else:
+        curve = EASINGS[easing](np.linspace(0, 1, frames)).astype(np.float32)
+    curve.flags.writeable = False
+    return curve
+
+
+def tween(start, end, progress, easing="linear"):
+    """
+    Returns the colours part way between 'start' and 'end', for a one-off
+    calculation. Use Tween() for animations.
+
+    Params:
+        start       (array) RGB array, or a single colour [red, green, blue]
+        end         (array) RGB array, or a single colour [red, green, blue]
+        progress    (float) How far between start and end (0 to 1)
+        easing      (str)   Key from EASINGS
+    """
+    start = np.asarray(start, dtype=np.float32)
+    end = np.asarray(end, dtype=np.float32)
+    value = float(EASINGS[easing](np.float32(min(max(progress, 0), 1))))
+    return np.clip(start + ((end - start) * value) + 0.5, 0, 255).astype(np.uint8)
+
+
+class Tween(object):
+    """
+    Animates an array of colours to another over a duration, using an easing
+    curve sampled at the effect's frame rate.
+    """
+    def __init__(self, start, end, duration, fps, easing="linear", repeat=REPEAT_NONE):
+        """
+        Params:
+            start       (array) RGB array, or a single colour [red, green, blue]
+            end         (array) RGB array, or a single colour [red, green, blue]
+            duration    (float) Length of the animation in seconds
+            fps         (int)   Frames per second the effect is played at
+            easing      (str)   Key from EASINGS
+            repeat      (int)   REPEAT_* constant for frames after the end
+        """
+        start = np.asarray(start, dtype=np.float32)
+        end = np.asarray(end, dtype=np.float32)
+        start, end = np.broadcast_arrays(start, end)
+
+        self.frames = get_frame_count(duration, fps)
+        self.curve = get_curve(easing, self.frames)
+        self.repeat = repeat
+
+        # Adding 0.5 rounds to the nearest integer when converted
+        self._start = start + 0.5
+        self._delta = end - start
+        self._output = np.empty(start.shape, dtype=np.float32)
+
+    def _get_index(self, frame):
+        """
+        Returns the point on the curve for a frame number.
+        """
+        last = self.frames - 1
+        frame = max(frame, 0)
+        if last == 0:
+            return 0
+
+        if self.repeat == REPEAT_LOOP:
+            return frame % self.frames
+        if self.repeat == REPEAT_REVERSE:
+            position = frame % (last * 2)
+            return min(position, (last * 2) - position)
+        return min(frame, last)
+
+    def get_frame(self, frame):
+        """
+        Returns a uint8 array of the colours for a frame number, starting from 0.
+        """
+        np.multiply(self._delta, self.curve[self._get_index(frame)], out=self._output)
+        self._output += self._start
+        return np.clip(self._output, 0, 255).astype(np.uint8)
+
+    def is_finished(self, frame):
+        """
+        Returns a boolean to indicate the animation reached its end (and doesn't repeat).
+        """
+        return self.repeat == REPEAT_NONE and frame >= self.frames - 1
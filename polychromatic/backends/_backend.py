@@ -15,11 +15,15 @@ Refer to the online documentation for more details:
 https://docs.polychromatic.app/
 """
 
+import functools
 import glob
 import grp
+import json
 import os
 from typing import List
 
+import numpy as np
+
 from ..fx import FX
 
 
@@ -140,6 +144,9 @@ class Backend(BackendBase):
         # This module may contain useful functions. See BackendHelpers() for usage.
         self.helpers = BackendHelpers()
 
+        # Function to call when devices are inserted/removed. Assigned by the middleman.
+        self.on_devices_changed = None
+
     def init(self):
         """
         Perform the logic for initalizing the backend, such as connecting
@@ -151,6 +158,30 @@ class Backend(BackendBase):
         """
         raise NotImplementedError
 
+    def wait_for_daemon(self, timeout):
+        """
+        Optional. Block until the daemon (or service) this backend connects to
+        becomes available, for up to 'timeout' seconds. This is used when the
+        user's session starts, as the daemon may still be starting up.
+
+        Backends that can be notified when their daemon starts should reimplement
+        this, otherwise init() will be retried periodically instead.
+
+        Return:
+            - True      Daemon is available. init() will be called again.
+            - False     Timed out.
+            - None      Not implemented.
+        """
+        return None
+
+    def devices_changed(self):
+        """
+        Backends that are notified by their daemon when devices are inserted or
+        removed should call this, so cached DeviceItem() objects are discarded.
+        """
+        if self.on_devices_changed:
+            self.on_devices_changed()
+
     class UnknownDeviceItem(object):
         """
         An object describing a device that may potentially be compatible, but
@@ -193,8 +224,15 @@ class Backend(BackendBase):
 
         This object also contains the code for executing options and parameters,
         as well as defining how Polychromatic should present them.
+
+        Attributes that are costly to query from the hardware (such as zones,
+        options, DPI and battery) can be deferred with set_lazy(), so they are
+        only created when first accessed.
         """
         def __init__(self):
+            # Functions to create attributes on first access. See set_lazy()
+            self._lazy = {}
+
             # Human readable name of the device (including vendor name)
             self.name = "Unnamed Device"
 
@@ -251,6 +289,35 @@ class Backend(BackendBase):
         def __repr__(self):
             return "{0}:{1}".format(self.serial, self.name.replace(" ", ""))
 
+        def __getattr__(self, name):
+            # Only called when the attribute doesn't exist (yet)
+            function = self.__dict__.get("_lazy", {}).get(name)
+            if not function:
+                raise AttributeError("'{0}' object has no attribute '{1}'".format(type(self).__name__, name))
+
+            value = function()
+            setattr(self, name, value)
+            self._lazy.pop(name, None)
+            return value
+
+        def set_lazy(self, name, function):
+            """
+            Defer setting an attribute until it is accessed for the first time,
+            for example, to avoid querying the hardware for a device's options
+            when only its name or serial is needed.
+
+            The function runs when the attribute is first accessed, rather than
+            when the device is looked up, so the backend should handle its own
+            errors (such as the hardware no longer responding) and return a
+            value the application can use, e.g. None or an empty list.
+
+            Params:
+                name        (str)       Attribute name, e.g. "zones"
+                function    (callable)  Takes no parameters and returns the value
+            """
+            self.__dict__.pop(name, None)
+            self._lazy[name] = function
+
         def refresh(self):
             """
             This function is called before showing the current status for a device, such as:
@@ -327,8 +394,26 @@ class Backend(BackendBase):
             Devices with NAND/flash memory that isn't designed for repeated usage
             should not implement this feature, as it may damage the hardware.
 
+            Drawing functions (fill, set_row, blit, etc) use set() for each LED,
+            unless the backend reimplements set_frame() to send whole frames at once.
+
+            Brightness and gamma are applied in software by fx.FX(), which also
+            keeps the frame drawn so far. Backends must call record_led() in
+            set(), record_frame() in set_frame() and record_clear() in clear(),
+            then send the colours they return. Set 'monochromatic' if the device
+            only displays the green value. When brightness or gamma change, the
+            frame drawn so far is set again through set_frame().
+
+            If the physical LEDs don't match how they appear on the hardware,
+            use set_remap() to present a virtual matrix instead. Backends must
+            then use get_physical_leds() and get_physical_frame() to find
+            which LEDs to set.
+
             See also: fx.FX()
             """
+            # MatrixRemap() from virtual to physical LEDs, or None if they are the same
+            remap = None
+
             def __init__(self):
                 self.name = "Unknown Device"
                 self.form_factor_id = "unrecognised"
@@ -359,11 +444,31 @@ class Backend(BackendBase):
                 """
                 raise NotImplementedError
 
-            def brightness(self, percent):
+            def set_remap(self, remap):
                 """
-                Set the global brightness of the LEDs. Could be used for fade effects globally.
+                Present the virtual matrix of a MatrixRemap() for effects to draw on.
                 """
-                raise NotImplementedError
+                self.remap = remap
+                self.rows = remap.virtual_rows
+                self.cols = remap.virtual_cols
+                self.record_clear()
+
+            def get_physical_leds(self, x, y):
+                """
+                Returns a list of physical (x, y) co-ordinates for a LED on the matrix.
+                """
+                if self.remap is None:
+                    return [(x, y)]
+                return self.remap.get_physical_leds(x, y)
+
+            def get_physical_frame(self, frame):
+                """
+                Returns a frame buffer as it should be sent to the physical LEDs.
+                """
+                frame = np.asarray(frame, dtype=np.uint8)
+                if self.remap is None:
+                    return frame
+                return self.remap.get_physical_frame(frame)
 
         class Zone(object):
             """
@@ -631,6 +736,81 @@ class Backend(BackendBase):
         return None
 
 
+class MatrixRemap(object):
+    """
+    Describes how a virtual matrix (which effects draw on) is wired to the
+    physical LEDs of the hardware, for devices with quirks. For example, a
+    physical LED that blends with its neighbour can be driven as one LED.
+
+    The map is compiled once into an index, so whole frames are remapped in
+    a single lookup, rather than processing each LED.
+
+    Raises ValueError if the LEDs aren't a rectangle, or refer to LEDs outside
+    the virtual matrix.
+    """
+    def __init__(self, virtual_rows, virtual_cols, leds):
+        """
+        Params:
+            virtual_rows    (int)   Rows of the virtual matrix
+            virtual_cols    (int)   Columns of the virtual matrix
+            leds            (list)  For each physical LED, indexed as leds[y][x], the
+                                    virtual [x, y] LED that sets its colour, or None for off.
+        """
+        self.virtual_rows = virtual_rows
+        self.virtual_cols = virtual_cols
+        self.rows = len(leds)
+        self.cols = len(leds[0]) if leds else 0
+
+        for y, row in enumerate(leds):
+            if len(row) != self.cols:
+                raise ValueError("Row {0} has {1} LEDs, expected {2}".format(y, len(row), self.cols))
+
+        # Index into a flattened virtual frame, with an extra LED at the end that stays off
+        off = virtual_rows * virtual_cols
+        self._index = np.full((self.rows, self.cols), off, dtype=np.intp)
+        self._physical_leds = {}
+
+        for y, row in enumerate(leds):
+            for x, led in enumerate(row):
+                if led is None:
+                    continue
+                virtual_x, virtual_y = led
+                if not (0 <= virtual_x < virtual_cols and 0 <= virtual_y < virtual_rows):
+                    raise ValueError("LED [{0}, {1}] is outside the virtual matrix".format(virtual_x, virtual_y))
+                self._index[y, x] = (virtual_y * virtual_cols) + virtual_x
+                self._physical_leds.setdefault((virtual_x, virtual_y), []).append((x, y))
+
+        self._off = np.zeros((1, 3), dtype=np.uint8)
+
+    def get_physical_leds(self, x, y):
+        """
+        Returns a list of physical (x, y) co-ordinates driven by a virtual LED.
+        """
+        return self._physical_leds.get((x, y), [])
+
+    def get_physical_frame(self, frame):
+        """
+        Returns a frame for the physical LEDs from a frame of the virtual matrix,
+        both indexed as [y, x] = (red, green, blue).
+        """
+        leds = np.asarray(frame, dtype=np.uint8).reshape(-1, 3)
+        return np.concatenate((leds, self._off))[self._index]
+
+
+@functools.lru_cache(maxsize=None)
+def _load_matrix_remaps(path):
+    """
+    Returns the dictionary of remaps from a JSON file for get_matrix_remap(),
+    or an empty dictionary if it can't be read. The file is only read once.
+    """
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
 class BackendHelpers():
     """
     Shared functions that are useful for backends.
@@ -650,6 +830,36 @@ class BackendHelpers():
                         found_pids.append(pid)
         return found_pids
 
+    def get_matrix_remap(self, path, name, rows, cols):
+        """
+        Returns a MatrixRemap() for a device from a JSON file, if the device
+        has one and its physical matrix is the specified size. Otherwise, None.
+
+        The file is a dictionary keyed by device name, for example:
+        {
+            "Device Name": {
+                "note": "Explanation of the quirk",
+                "virtual_rows": 1,
+                "virtual_cols": 2,
+                "leds": [[[0, 0], [0, 0], [1, 0], null]]
+            }
+        }
+
+        Raises ValueError if the device's entry is invalid.
+        """
+        data = _load_matrix_remaps(path).get(name)
+        if not data:
+            return None
+
+        try:
+            remap = MatrixRemap(data["virtual_rows"], data["virtual_cols"], data["leds"])
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError("Invalid remap for '{0}' in {1}: {2}".format(name, path, str(e)))
+
+        if remap.rows != rows or remap.cols != cols:
+            return None
+        return remap
+
     def is_user_in_group(self, group):
         """
         Check the user groups for the currently logged in user and returns a
@@ -12,11 +12,19 @@ Project URL: https://github.com/openrazer/openrazer
 import glob
 import os
 
+import numpy as np
 import openrazer.client as rclient  # pylint: disable=import-error
 
 from .. import common
 from ._backend import Backend as Backend
 
+# Name the daemon owns on the session bus
+DAEMON_BUS_NAME = "org.razer"
+
+# Object and interface the daemon uses to list devices and announce changes
+DAEMON_DEVICES_PATH = "/org/razer"
+DAEMON_DEVICES_INTERFACE = "razer.devices"
+
 
 class OpenRazerBackend(Backend):
     """
@@ -40,9 +48,15 @@ class OpenRazerBackend(Backend):
 
         # Variables for OpenRazer
         self.devman = None
+        self.rdevices = []
         self.persistence_supported = True
         self.persistence_fallback_path = os.path.join(self.get_backend_storage_path(), "persistence")
 
+        # Connection for the daemon's signals, when devices are inserted/removed
+        self._signal_bus = None
+        self._devices_changed = False
+        self._reconnect = False
+
         # Client Settings
         self.ripple_refresh_rate = 0.05
         self.load_client_overrides()
@@ -58,6 +72,103 @@ class OpenRazerBackend(Backend):
         self.debug("Connecting to daemon...")
         self.devman = rclient.DeviceManager()
         self.devman.sync_effects = False
+        self.rdevices = list(self.devman.devices)
+        self._devices_changed = False
+        self._reconnect = False
+
+    def _connect_signals(self):
+        """
+        Listen for the daemon's "device_added" and "device_removed" signals, so
+        the device list can be updated when devices are inserted or removed,
+        instead of reconnecting to the daemon each time devices are requested.
+
+        The signals are received by the GLib main loop, which the tray applet
+        (GTK) and controller (Qt) run. The CLI and effects helper don't, so
+        pending signals are also processed when devices are requested.
+
+        Returns a boolean to indicate the signals are connected.
+        """
+        try:
+            import dbus  # pylint: disable=import-error
+            from dbus.mainloop.glib import DBusGMainLoop  # pylint: disable=import-error
+            from gi.repository import GLib  # pylint: disable=import-error,unused-import
+        except ImportError:
+            return False
+
+        def _device_changed():
+            self.debug("Devices were inserted or removed")
+            self._devices_changed = True
+            self.devices_changed()
+
+        def _name_owner_changed(name, old_owner, new_owner):
+            # Daemon stopped or restarted, so the client's objects are stale
+            self.debug("Daemon restarted" if new_owner else "Daemon stopped")
+            self._reconnect = True
+            self.devices_changed()
+
+        try:
+            # A private connection, as the client's connection has no main loop
+            bus = dbus.SessionBus(mainloop=DBusGMainLoop(), private=True)
+            for signal_name in ["device_added", "device_removed"]:
+                bus.add_signal_receiver(_device_changed, signal_name=signal_name, dbus_interface=DAEMON_DEVICES_INTERFACE,
+                                        bus_name=DAEMON_BUS_NAME, path=DAEMON_DEVICES_PATH)
+            bus.add_signal_receiver(_name_owner_changed, signal_name="NameOwnerChanged",
+                                    dbus_interface="org.freedesktop.DBus", arg0=DAEMON_BUS_NAME)
+        except Exception as e:
+            self.debug("Cannot listen for devices being inserted/removed: " + str(e))
+            return False
+
+        self._signal_bus = bus
+        return True
+
+    def _dispatch_signals(self):
+        """
+        Process signals received since the last request, for processes that
+        don't run a GLib main loop.
+
+        When called from within a main loop (tray applet, controller), nothing
+        is done, as the loop already processes the signals, and iterating here
+        would run the application's other sources while devices are requested.
+        """
+        from gi.repository import GLib  # pylint: disable=import-error
+
+        if GLib.main_depth() > 0:
+            return
+
+        context = GLib.MainContext.default()
+        while context.pending():
+            context.iteration(False)
+
+    def _update_device_list(self):
+        """
+        Bring the list of OpenRazer device objects up-to-date. When the daemon's
+        signals are connected, only devices that were inserted are created.
+        """
+        if self._signal_bus:
+            self._dispatch_signals()
+
+        if not self.devman or self._reconnect:
+            self._reload_device_manager()
+            return
+
+        if not self._devices_changed:
+            return
+
+        from openrazer.client.device import RazerDeviceFactory  # pylint: disable=import-error
+
+        self._devices_changed = False
+        daemon = self._signal_bus.get_object(DAEMON_BUS_NAME, DAEMON_DEVICES_PATH)
+        serials = [str(serial) for serial in daemon.getDevices(dbus_interface=DAEMON_DEVICES_INTERFACE)]
+        existing = {str(rdevice.serial): rdevice for rdevice in self.rdevices}
+
+        rdevices = []
+        for serial in serials:
+            rdevice = existing.get(serial)
+            if not rdevice:
+                self.debug("Adding device: " + serial)
+                rdevice = RazerDeviceFactory.get_device(serial)
+            rdevices.append(rdevice)
+        self.rdevices = rdevices
 
     def init(self):
         """
@@ -72,11 +183,58 @@ class OpenRazerBackend(Backend):
 
         try:
             self._reload_device_manager()
-            return True
         except Exception as e:
             self.debug("Failed: Got an exception initialising device manager!")
             return self.get_exception_as_string(e)
 
+        if not self._signal_bus:
+            self._connect_signals()
+        return True
+
+    def wait_for_daemon(self, timeout):
+        """
+        Wait for the daemon to appear on the session bus, which is announced
+        by D-Bus with the "NameOwnerChanged" signal. This requires the GLib
+        main loop (PyGObject).
+        """
+        try:
+            import dbus  # pylint: disable=import-error
+            from dbus.mainloop.glib import DBusGMainLoop  # pylint: disable=import-error
+            from gi.repository import GLib  # pylint: disable=import-error
+        except ImportError:
+            return None
+
+        # A private connection, as the client's connection has no main loop
+        bus = dbus.SessionBus(mainloop=DBusGMainLoop(), private=True)
+        loop = GLib.MainLoop()
+
+        def _name_owner_changed(name, old_owner, new_owner):
+            if new_owner:
+                loop.quit()
+
+        timed_out = []
+
+        def _timed_out():
+            timed_out.append(True)
+            loop.quit()
+            return False
+
+        receiver = bus.add_signal_receiver(_name_owner_changed, signal_name="NameOwnerChanged",
+                                           dbus_interface="org.freedesktop.DBus", arg0=DAEMON_BUS_NAME)
+
+        # The daemon may have started before the signal was connected
+        if not bus.name_has_owner(DAEMON_BUS_NAME):
+            self.debug("Waiting for daemon to start...")
+            timer = GLib.timeout_add(int(timeout * 1000), _timed_out)
+            loop.run()
+            if not timed_out:
+                GLib.source_remove(timer)
+
+        ready = bool(bus.name_has_owner(DAEMON_BUS_NAME))
+        receiver.remove()
+        bus.close()
+        return ready
+
     def load_client_overrides(self):
         """
         Load any user-defined client settings that Polychromatic should use
@@ -113,8 +271,13 @@ class OpenRazerBackend(Backend):
         unreg_pids = []
 
         # Get VIDs and PIDs from daemon to exclude later.
+        try:
+            self._update_device_list()
+        except Exception as e:
+            self.debug("Could not update device list: " + str(e))
+
         if self.devman:
-            for rdevice in self.devman.devices:
+            for rdevice in self.rdevices:
                 vidpid = self._get_device_vid_pid(rdevice)
                 reg_pids.append(vidpid.get("pid"))
 
@@ -146,10 +309,14 @@ class OpenRazerBackend(Backend):
         """
         devices = []
         try:
-            self._reload_device_manager()
+            if self._signal_bus:
+                self._update_device_list()
+            else:
+                # Without the daemon's signals, reconnect to get a new list
+                self._reload_device_manager()
         except Exception:
             return []
-        for rdevice in self.devman.devices:
+        for rdevice in self.rdevices:
             devices.append(self._get_device(rdevice))
         return devices
 
@@ -158,7 +325,8 @@ class OpenRazerBackend(Backend):
         See Backend.get_device_by_name()
         """
         try:
-            for rdevice in self.devman.devices:
+            self._update_device_list()
+            for rdevice in self.rdevices:
                 if rdevice.name == name:
                     return self._get_device(rdevice)
         except Exception as e:
@@ -169,7 +337,8 @@ class OpenRazerBackend(Backend):
         See Backend.get_device_by_serial()
         """
         try:
-            for rdevice in self.devman.devices:
+            self._update_device_list()
+            for rdevice in self.rdevices:
                 if not rdevice.has("serial"):
                     continue
                 if rdevice.serial == serial:
@@ -192,9 +361,14 @@ class OpenRazerBackend(Backend):
         # Device details
         class OpenRazerDeviceItem(Backend.DeviceItem):
             def refresh(self):
+                # Some options read their state when the zones are created, so
+                # if that happens now, they don't need to be read again
+                creating_zones = "zones" in self._lazy
                 for zone in self.zones:
                     zone._persistence.refresh()
                     for option in zone.options:
+                        if creating_zones and getattr(option, "_state_read", False):
+                            continue
                         option.refresh()
                 if self.dpi:
                     self.dpi.refresh()
@@ -212,26 +386,70 @@ class OpenRazerBackend(Backend):
         device.pid = _vid_pid.get("pid")
 
         if rdevice.has("firmware_version"):
-            device.firmware_version = str(rdevice.firmware_version)
+            self._set_lazy(device, "firmware_version", lambda: str(rdevice.firmware_version), "")
 
         if rdevice.has("keyboard_layout"):
-            device.keyboard_layout = str(rdevice.keyboard_layout)
+            self._set_lazy(device, "keyboard_layout", lambda: str(rdevice.keyboard_layout), "")
 
+        # Fixed DPI devices are presented as an option instead (see _get_main_zone_options())
         if rdevice.has("dpi") and not rdevice.has("available_dpi"):
-            device.dpi = self._get_dpi_object(rdevice)
+            self._set_lazy(device, "dpi", lambda: self._get_dpi_object(rdevice), None)
 
         if rdevice.has("battery"):
-            device.battery = self._get_battery_object(rdevice)
+            self._set_lazy(device, "battery", lambda: self._get_battery_object(rdevice), None)
 
         if rdevice.has("lighting_led_matrix"):
-            device.matrix = self._get_matrix_object(rdevice, device)
+            self._set_lazy(device, "matrix", lambda: self._get_matrix_object(rdevice, device), None)
+
+        if rdevice.has("macro_mode_led_effect") and rdevice.type == "keyboard":
+            device.has_programmable_keys = True
+
+        if rdevice.has("macro_logic") and rdevice.type == "keyboard":
+            device.has_macro_keys = True
+
+        # Zones and their options read the device's current state
+        self._set_lazy(device, "zones", lambda: self._get_zones_with_options(rdevice, serial), [])
+
+        return device
+
+    def _set_lazy(self, device, name, function, default):
+        """
+        Defer creating an attribute of a device until it is accessed (see
+        Backend.DeviceItem.set_lazy()).
 
-        # Initialize zones
-        device.zones = self._get_zone_objects(rdevice)
-        main_zone = device.zones[0]
+        This queries the daemon outside of get_device_by_serial() and
+        get_device_by_name(), where errors are otherwise caught. If the daemon
+        fails (for example, the device was removed), the error is output and
+        the attribute is treated as unsupported by using the default value.
+        """
+        def _get_attribute():
+            try:
+                return function()
+            except Exception as e:
+                self.debug("Failed to get '{0}' for {1}: {2}".format(name, device.name, str(e)))
+                self.debug(self.get_exception_as_string(e))
+                return default
+
+        device.set_lazy(name, _get_attribute)
+
+    def _read_on_creation(self, option):
+        """
+        Read the current state of an option as it is created. These won't be
+        read again if the device's zones are being created by a refresh().
+        """
+        option.refresh()
+        option._state_read = True
+
+    def _get_zones_with_options(self, rdevice, serial):
+        """
+        Returns a list of Backend.DeviceItem.Zone() objects, with the options
+        for each zone and the device's other options in the main zone.
+        """
+        zones = self._get_zone_objects(rdevice)
+        main_zone = zones[0]
 
         # Add brightness & effects (per zone)
-        for zone in device.zones:
+        for zone in zones:
             zone._persistence = self._get_persistence(self._map_zone_id_to_rzone(rdevice, zone), zone, serial)
 
             brightness = self._get_brightness_option(rdevice, zone)
@@ -248,33 +466,35 @@ class OpenRazerBackend(Backend):
             main_zone.options = [option for option in main_zone.options if not isinstance(option, Backend.EffectOption)]
             main_zone.options += workarounds
 
-        # Add other "main" options
+        main_zone.options += self._get_main_zone_options(rdevice)
+        return zones
+
+    def _get_main_zone_options(self, rdevice):
+        """
+        Returns a list of options that apply to the whole device, which are
+        presented in the main zone.
+        """
+        options = []
+
         if rdevice.has("available_dpi"):
-            device.dpi = None
-            main_zone.options.append(self._get_dpi_fixed_object(rdevice))
+            options.append(self._get_dpi_fixed_object(rdevice))
 
         if rdevice.has("poll_rate"):
-            main_zone.options.append(self._get_poll_rate_option(rdevice))
+            options.append(self._get_poll_rate_option(rdevice))
 
         if rdevice.has("game_mode_led"):
-            main_zone.options.append(self._get_game_mode_option(rdevice))
+            options.append(self._get_game_mode_option(rdevice))
 
         if rdevice.has("keyswitch_optimization"):
-            main_zone.options.append(self._get_keyswitch_option(rdevice))
+            options.append(self._get_keyswitch_option(rdevice))
 
         if rdevice.has("battery"):
-            main_zone.options += self._get_battery_options(rdevice)
-
-        if rdevice.has("macro_mode_led_effect") and rdevice.type == "keyboard":
-            device.has_programmable_keys = True
-
-        if rdevice.has("macro_logic") and rdevice.type == "keyboard":
-            device.has_macro_keys = True
+            options += self._get_battery_options(rdevice)
 
         if rdevice.has("scroll_mode") or rdevice.has("scroll_acceleration") or rdevice.has("scroll_smart_reel"):
-            main_zone.options += self._get_scroll_options(rdevice)
+            options += self._get_scroll_options(rdevice)
 
-        return device
+        return options
 
     def _get_persistence(self, rzone, zone, serial):
         """
@@ -383,14 +603,12 @@ class OpenRazerBackend(Backend):
         This is used for devices that have a fixed DPI and do not support the
         'variable' slider.
         """
-        current_dpi = int(rdevice.dpi[0])
         parameters = []
 
         for index, dpi in enumerate(list(rdevice.available_dpi)):
             param = Backend.Option.Parameter()
             param.data = int(dpi)
             param.label = str(dpi)
-            param.active = True if dpi == current_dpi else False
             param.default = True if index == 0 else False
             parameters.append(param)
 
@@ -414,6 +632,7 @@ class OpenRazerBackend(Backend):
         fixed_dpi = FixedDPIOption(rdevice, parameters)
         fixed_dpi.label = self._("DPI")
         fixed_dpi.icon = self.get_icon("general", "dpi")
+        self._read_on_creation(fixed_dpi)
 
         return fixed_dpi
 
@@ -428,44 +647,60 @@ class OpenRazerBackend(Backend):
                 self.form_factor_id = device.form_factor["id"]
                 self.rows = int(rdevice.fx.advanced.rows)
                 self.cols = int(rdevice.fx.advanced.cols)
+                self.monochromatic = device.monochromatic
 
             def set(self, x, y, red, green, blue):
-                self._rdevice.fx.advanced.matrix[y, x] = (red, green, blue)
+                red, green, blue = self.record_led(x, y, red, green, blue)
+                if self.remap is None:
+                    self._rdevice.fx.advanced.matrix[y, x] = (red, green, blue)
+                    return
+
+                for physical_x, physical_y in self.remap.get_physical_leds(x, y):
+                    self._rdevice.fx.advanced.matrix[physical_y, physical_x] = (red, green, blue)
+
+            def _get_client_buffer(self):
+                """
+                Returns the client's frame buffer (a NumPy array indexed as
+                [channel, y, x]), or None if this version of the client
+                stores it differently.
+                """
+                advanced = self._rdevice.fx.advanced
+                buffer = getattr(advanced.matrix, "_matrix", None)
+                if isinstance(buffer, np.ndarray) and buffer.shape == (3, int(advanced.rows), int(advanced.cols)):
+                    return buffer
+                return None
+
+            def set_frame(self, frame):
+                """
+                Write the whole frame into the client's buffer in one operation,
+                instead of setting each LED individually.
+                """
+                buffer = self._get_client_buffer()
+                if buffer is None:
+                    super().set_frame(frame)
+                    return
+                buffer[:] = self.get_physical_frame(self.record_frame(frame)).transpose(2, 0, 1)
 
             def draw(self):
                 self._rdevice.fx.advanced.draw()
 
             def clear(self):
+                self.record_clear()
                 self._rdevice.fx.advanced.matrix.reset()
 
-            def brightness(self):
-                print("todo:stub:_get_matrix_object.brightness")
-
-        class DeathStalkerMatrix(OpenRazerMatrix):
-            """
-            Alternate matrix implementation for Razer DeathStalker Chroma, which
-            has a matrix of 12x1, but every second LED [2,4,6,8,10,12]
-            physically blends with its previous LED [1,3,5,7,9,11], which messes
-            up the lighting colours (#335)
-
-            This matrix is virtual. It'll stretch LEDs by two for each one. Example:
-                Virtual     Physical
-                0       ->  0, 1
-                5       ->  10, 11
-            """
-            def __init__(self, rdevice):
-                super().__init__(rdevice)
-                self.cols = 6
+        matrix = OpenRazerMatrix(rdevice)
 
-            def set(self, x, y, red, green, blue):
-                self._rdevice.fx.advanced.matrix[y, (x * 2)] = (red, green, blue)
-                self._rdevice.fx.advanced.matrix[y, (x * 2) + 1] = (red, green, blue)
+        # Some devices have quirks with how their LEDs are wired (e.g. #335)
+        try:
+            remap = self.helpers.get_matrix_remap(os.path.join(self._base.paths.data_dir, "devices", "openrazer-remaps.json"), matrix.name, matrix.rows, matrix.cols)
+        except ValueError as e:
+            self.debug("Ignoring LED remap: " + str(e))
+            remap = None
 
-        # OpenRazer changed this matrix after 3.1 (6 => 12)
-        if rdevice.name == "Razer DeathStalker Chroma" and rdevice.fx.advanced.cols == 12:
-            return DeathStalkerMatrix(rdevice)
+        if remap:
+            matrix.set_remap(remap)
 
-        return OpenRazerMatrix(rdevice)
+        return matrix
 
     def _get_zone_objects(self, rdevice):
         """
@@ -1329,7 +1564,6 @@ class OpenRazerBackend(Backend):
         """
         Returns a Backend.Option derivative object for setting a mouse's poll rate.
         """
-        current_rate = int(rdevice.poll_rate)
         parameters = []
 
         # OpenRazer <= 3.1.0 were hardcoded (not exposed via API)
@@ -1342,7 +1576,6 @@ class OpenRazerBackend(Backend):
         for rate in supported_poll_rates:
             param = Backend.Option.Parameter()
             param.data = rate
-            param.active = True if current_rate == rate else False
 
             # 500 Hz  = 2 millisecond latency
             # 1000 Hz = 1 millisecond latency
@@ -1379,6 +1612,7 @@ class OpenRazerBackend(Backend):
         poll_rate = PollRateOption(rdevice, parameters)
         poll_rate.label = self._("Poll Rate")
         poll_rate.icon = self.get_icon("options", "poll_rate")
+        self._read_on_creation(poll_rate)
         return poll_rate
 
     def _get_game_mode_option(self, rdevice):
@@ -1516,7 +1750,7 @@ class OpenRazerBackend(Backend):
             scroll_mode.label = self._("Scroll Mode")
             scroll_mode.icon = self.get_icon("devices", "mouse")
             scroll_mode.parameters = [tactile, free_spin]
-            scroll_mode.refresh()
+            self._read_on_creation(scroll_mode)
             options.append(scroll_mode)
 
         if rdevice.has("scroll_acceleration"):
@@ -1536,7 +1770,7 @@ class OpenRazerBackend(Backend):
             scroll_accel.label = self._("Scroll Acceleration")
             scroll_accel.icon = self.get_icon("devices", "mouse")
             scroll_accel.label_toggle = self._("Enable scroll acceleration")
-            scroll_accel.refresh()
+            self._read_on_creation(scroll_accel)
             options.append(scroll_accel)
 
         if rdevice.has("scroll_smart_reel"):
@@ -1556,7 +1790,7 @@ class OpenRazerBackend(Backend):
             smart_reel.label = self._("Smart Reel")
             smart_reel.icon = self.get_icon("devices", "mouse")
             smart_reel.label_toggle = self._("Enable smart reel")
-            smart_reel.refresh()
+            self._read_on_creation(smart_reel)
             options.append(smart_reel)
 
         return options
@@ -1591,7 +1825,7 @@ class OpenRazerBackend(Backend):
         option.label = self._("Optimise for")
         option.icon = self.get_icon("devices", "keyboard")
         option.parameters = [typing, gaming]
-        option.refresh()
+        self._read_on_creation(option)
         return option
 
     def restart(self):
@@ -11,8 +11,6 @@ import sys
 import traceback
 from threading import Thread
 
-import colorama
-
 # TODO: Refactor later!
 paths = None
 
@@ -34,6 +32,8 @@ FORM_FACTORS = [
     "unrecognised"
 ]
 
+# Two digit hex for each byte, for rgb_to_hex()
+HEX_BYTES = ["{0:02X}".format(value) for value in range(0, 256)]
 
 
 class Debugging(object):
@@ -41,6 +41,9 @@ class Debugging(object):
     Outputs pretty debugging details to the terminal.
     """
     def __init__(self):
+        # Imported here, as the helper's fast path uses this module without output
+        import colorama
+
         self.verbose_level = 0
         colorama.init()
 
@@ -55,7 +58,7 @@ class Debugging(object):
         self.grey = colorama.Fore.LIGHTBLACK_EX
         self.normal = colorama.Fore.RESET
 
-    def stdout(self, msg, colour_code=colorama.Fore.RESET, verbosity=0, overwritable=False):
+    def stdout(self, msg, colour_code="\033[39m", verbosity=0, overwritable=False):
         # msg           String containing message for stdout.
         # color         stdout code (e.g. '\033[92m')
         # verbosity     0 = Always shown
@@ -413,17 +416,51 @@ def rgb_to_hex(rgb_list):
     """
     Converts [R,G,B] list to #RRGGBB string.
     Polychromatic stores and processes colours as hex values.
+
+    Raises ValueError if a value is outside 0-255.
     """
-    return "#{0:02X}{1:02X}{2:02X}".format(*rgb_list)
+    red, green, blue = rgb_list
+    if not (0 <= red <= 255 and 0 <= green <= 255 and 0 <= blue <= 255):
+        raise ValueError("RGB values must be between 0 and 255: {0}".format(list(rgb_list)))
+    return "#" + HEX_BYTES[red] + HEX_BYTES[green] + HEX_BYTES[blue]
 
 
 def hex_to_rgb(hex_string):
     """
     Converts "#RRGGBB" string to [R,G,B] list.
     Some backends/logic may expect colours to be individual RGB values.
+
+    Any digits after RRGGBB (such as alpha) are ignored. Raises ValueError if
+    there are less than 6 hex digits.
+    """
+    rgb = list(bytes.fromhex(hex_string.lstrip("#")[:6]))
+    if len(rgb) != 3:
+        raise ValueError("Colour must be in the format #RRGGBB: " + hex_string)
+    return rgb
+
+
+def hex_list_to_rgb_buffer(hex_list):
+    """
+    Converts a list of "#RRGGBB" strings to packed RGB bytes, for example:
+
+    Input:  ["#FF0000", "#00FF80"]
+    Output: b"\xff\x00\x00\x00\xff\x80"
+
+    The output can be passed to numpy.frombuffer() or FX.blit().
+    """
+    buffer = bytes.fromhex("".join([value.lstrip("#") for value in hex_list]))
+    if len(buffer) != len(hex_list) * 3:
+        raise ValueError("Colours must be in the format #RRGGBB")
+    return buffer
+
+
+def rgb_buffer_to_hex_list(buffer):
+    """
+    Converts packed RGB bytes (such as bytes or a uint8 NumPy array) to a list
+    of "#RRGGBB" strings. The opposite of hex_list_to_rgb_buffer().
     """
-    hex_string = hex_string.lstrip("#")
-    return list(int(hex_string[i:i+2], 16) for i in (0, 2 ,4))
+    hex_string = bytes(buffer).hex().upper()
+    return ["#" + hex_string[i:i + 6] for i in range(0, len(hex_string), 6)]
 
 
 def validate_hex(value):
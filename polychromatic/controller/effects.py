@@ -354,6 +354,18 @@ class EffectsTab(shared.CommonFileTab):
         if not device_name:
             device_name = self.current_file_data["map_device"]
 
+        # Switch effect within the effects helper if running, otherwise start it
+        reply = procpid.EffectHelperClient().play(self.current_file_path, names=[device_name])
+        if reply and reply["ok"]:
+            return
+
+        if reply:
+            self.widgets.open_dialog(self.widgets.dialog_error,
+                                     self._("Play Effect"),
+                                     self._("The effect could not be played."),
+                                     details=reply["error"])
+            return
+
         procmgr = procpid.ProcessManager("helper")
         procmgr.start_component(["--run-fx", self.current_file_path, "--device-name", device_name])
 
@@ -148,6 +148,10 @@ class ProcessViewer(PolychromaticBase):
         self.btn_stop.setEnabled(False)
 
         for component in components:
+            # Listed by each device that it is playing effects for
+            if component == procpid.FX_HELPER:
+                continue
+
             procmgr = procpid.ProcessManager(component)
             pid = str(procmgr._get_component_pid())
             running = procmgr.is_another_instance_is_running()
@@ -118,6 +118,10 @@ class EffectFileManagement(fileman.FlatFileManagement):
             results.append(self._validate_key(data, "loop", bool))
             results.append(self._validate_key(data, "frames", list))
 
+            # Optional, added in v0.9.8
+            if "interpolate" in data:
+                results.append(self._validate_key(data, "interpolate", bool))
+
         # Was validation successful?
         if False in results:
             self.dbg.stdout("The effect '{0}' contains invalid data.".format(path), self.dbg.error)
@@ -171,6 +175,7 @@ class EffectFileManagement(fileman.FlatFileManagement):
         elif effect_type == TYPE_SEQUENCE:
             data["fps"] = 10
             data["loop"] = True
+            data["interpolate"] = False
             data["frames"] = []
 
         return data
@@ -189,10 +194,34 @@ class EffectFileManagement(fileman.FlatFileManagement):
         data["save_format"] = fileman.VERSION
         return data
 
+    def save_item(self, data, orig_path=None):
+        """
+        In addition to the usual saving of an item, compile the effect for
+        playback in advance (for the device it was mapped to). The effect is
+        still saved if it can't be compiled, as playback will compile it later.
+        If the effect was renamed, the cache for its old path is removed.
+        """
+        success, target_path = super().save_item(data, orig_path)
+
+        if success and orig_path and orig_path != target_path:
+            from . import playback
+            playback.EffectCache().purge(orig_path)
+
+        if success and data["type"] in [TYPE_SEQUENCE, TYPE_LAYERED] and data["map_rows"] > 0 and data["map_cols"] > 0:
+            from . import playback
+            try:
+                playback.EffectCache().compile(target_path, data["map_rows"], data["map_cols"])
+            except Exception as e:
+                self.dbg.stdout("Could not compile effect for playback: " + target_path, self.dbg.warning)
+                self.dbg.stdout(common.get_exception_as_string(e), self.dbg.warning, 1)
+
+        return (success, target_path)
+
     def delete_item(self, path):
         """
         In addition to the usual deletion of an item, also delete the
-        effect's accompanying script (if a scripted effect)
+        effect's accompanying script (if a scripted effect) and its cache
+        for playback.
         """
         data = self._load_file(path)
 
@@ -204,7 +233,11 @@ class EffectFileManagement(fileman.FlatFileManagement):
             else:
                 self.dbg.stdout("Accompanying script file no longer exists: " + path, self.dbg.warning, 1)
 
-        return super().delete_item(path)
+        success = super().delete_item(path)
+        if success:
+            from . import playback
+            playback.EffectCache().purge(path)
+        return success
 
     def clone_item(self, path):
         """
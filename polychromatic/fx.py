@@ -13,12 +13,59 @@ To achieve effects, colours may be converted between different colour spaces:
     - HSL (Hue, Saturation, Lightness)  -> for black/white intensity
 """
 
+import functools
 import math
 
 import colour
+import numpy as np
 
 from . import common
 
+# Number of gradients to keep for FX.gradient() and FX.gradient_array()
+GRADIENT_CACHE_SIZE = 64
+
+
+@functools.lru_cache(maxsize=GRADIENT_CACHE_SIZE)
+def _get_gradient(colours, steps):
+    """
+    Compute a gradient for FX.gradient(). As effects tend to request the same
+    gradient every frame, the most recent are kept.
+
+    Returns a tuple: (hex values, read-only array of RGB values)
+    """
+    output = []
+    steps_between_stops = math.ceil(steps / (len(colours) - 1))
+
+    for index, item in enumerate(colours):
+        try:
+            next_colour = colours[index + 1]
+        except IndexError:
+            # This is the last colour
+            continue
+
+        c = colour.Color(item)
+        for c2 in list(c.range_to(next_colour, steps_between_stops)):
+            output.append(c2.get_hex_l())
+
+    lut = np.array([common.hex_to_rgb(value) for value in output], dtype=np.uint8).reshape(-1, 3)
+    lut.flags.writeable = False
+    return (tuple(output), lut)
+
+
+def get_gradient_array(colours, steps):
+    """
+    Returns the gradient from FX.gradient_array(). This is also used to render
+    gradients for layered effects, so they look the same as scripted effects.
+
+    Params:
+        colours     (list)  List of colours for the gradient
+        steps       (int)   Total colours to return for rendering the gradient
+    """
+    if len(colours) < 2:
+        raise ValueError("Insufficient colours! At least 2 required to generate gradient.")
+
+    return _get_gradient(tuple(colours), steps)[1]
+
 
 class FX(object):
     """
@@ -30,6 +77,21 @@ class FX(object):
 
     All classes stubbed as NotImplementedError should be implemented.
     """
+    # Last frame passed to update() and how many draws were unnecessary
+    _last_frame = None
+    draws_skipped = 0
+
+    # Frame as drawn by the effect (before brightness and gamma) as rows of colours
+    _frame = None
+
+    # Lookup table for brightness and gamma applied to frames, or None when unchanged
+    _output_lut = None
+    _brightness = 100
+    _gamma = 1.0
+
+    # Devices that only display the green value of RGB
+    monochromatic = False
+
     def __init__(self):
         self.name = "Unknown Device"
         self.form_factor_id = "unrecognised"
@@ -48,7 +110,8 @@ class FX(object):
 
     def set(self, x=0, y=0, red=255, green=255, blue=255):
         """
-        Set a colour at the specified co-ordinate.
+        Set a colour at the specified co-ordinate. Backends must pass the
+        colour through record_led() and send the colour it returns.
         """
         raise NotImplementedError
 
@@ -60,15 +123,275 @@ class FX(object):
 
     def clear(self):
         """
-        Reset all LEDs to an off state.
+        Reset all LEDs to an off state. Backends must call record_clear().
         """
         raise NotImplementedError
 
+    def set_frame(self, frame):
+        """
+        Set every LED from a frame buffer, indexed as frame[y][x] = (red, green, blue)
+        and matching the dimensions of this matrix.
+
+        Optional. Backends that can accept a whole frame at once should
+        reimplement this (passing it through record_frame() and sending the
+        frame it returns), otherwise each LED is set individually.
+        """
+        if hasattr(frame, "tolist"):
+            frame = frame.tolist()
+
+        for y in range(0, self.rows):
+            row = frame[y]
+            for x in range(0, self.cols):
+                red, green, blue = row[x]
+                self.set(x, y, red, green, blue)
+
+    def update(self, frame):
+        """
+        Show a frame buffer on the device (see set_frame), but only send the
+        LEDs that changed since the last update. If the frame is identical,
+        nothing is sent and draw() is skipped, which is counted in 'draws_skipped'.
+
+        LEDs changed in any other way (such as set() or clear()) in between
+        cause the whole frame to be sent.
+
+        Returns a boolean to indicate whether the frame was drawn.
+        """
+        frame = np.asarray(frame, dtype=np.uint8)
+        last_frame = self._last_frame
+
+        if last_frame is None or last_frame.shape != frame.shape:
+            self.set_frame(frame)
+        else:
+            changed = np.any(frame != last_frame, axis=2)
+            total_changed = int(np.count_nonzero(changed))
+
+            if total_changed == 0:
+                self.draws_skipped += 1
+                return False
+
+            # Set LEDs individually for small changes, otherwise use the whole frame
+            if total_changed <= self.cols:
+                for y, x in zip(*np.nonzero(changed)):
+                    red, green, blue = frame[y, x].tolist()
+                    self.set(int(x), int(y), red, green, blue)
+            else:
+                self.set_frame(frame)
+
+        self._last_frame = frame.copy()
+        self.draw()
+        return True
+
+    #######################################################
+    # Keeping track of the frame
+    #   Backends call these when LEDs are set or cleared. The frame drawn by
+    #   the effect is kept, so it can be sent again when brightness changes,
+    #   and update() knows when LEDs were changed by other means.
+    #######################################################
+    def record_led(self, x, y, red, green, blue):
+        """
+        Record a colour set by set(). Returns the colour to send to the
+        hardware, adjusted for brightness and gamma.
+        """
+        colour = (red, green, blue)
+        self._last_frame = None
+        try:
+            if x >= 0 and y >= 0:
+                self._frame[y][x] = colour
+        except (TypeError, IndexError):
+            if 0 <= y < self.rows and 0 <= x < self.cols:
+                # No frame recorded yet
+                self._frame = [[(0, 0, 0)] * self.cols for row in range(0, self.rows)]
+                self._frame[y][x] = colour
+
+        if self._output_lut is None:
+            return colour
+        return self.get_output_colour(red, green, blue)
+
+    def record_frame(self, frame):
+        """
+        Record a frame set by set_frame(). Returns the frame to send to the
+        hardware as an array, adjusted for brightness and gamma.
+        """
+        frame = np.asarray(frame, dtype=np.uint8)
+        self._last_frame = None
+        self._frame = frame.tolist()
+        return self.get_output_frame(frame)
+
+    def record_clear(self):
+        """
+        Record that all LEDs were reset by clear().
+        """
+        self._last_frame = None
+        self._frame = None
+
+    #######################################################
+    # Brightness and gamma
+    #   Applied as a single lookup for each colour value when the backend
+    #   sets LEDs, so every way of drawing (set, update, blit, etc) is affected.
+    #   When changed, the frame drawn so far is set again in one pass.
+    #######################################################
     def brightness(self, percent):
         """
-        Set the global brightness of the LEDs. Could be used for fade effects globally.
+        Set the global brightness of the LEDs (0 to 100), which can be used to
+        fade effects globally. Takes effect on the next draw() or update(),
+        without needing to set the LEDs again.
         """
-        raise NotImplementedError
+        self._brightness = min(max(percent, 0), 100)
+        self._update_output_lut()
+
+    def set_gamma(self, gamma):
+        """
+        Set the gamma correction for the LEDs, where 1.0 is unchanged. Values
+        above 1 darken the lower levels, which can make fades look more even.
+        Takes effect on the next draw() or update().
+        """
+        self._gamma = max(float(gamma), 0.01)
+        self._update_output_lut()
+
+    def _update_output_lut(self):
+        """
+        Precompute the output level for each of the 256 input levels.
+        """
+        if self._brightness == 100 and self._gamma == 1.0:
+            self._output_lut = None
+        else:
+            levels = np.arange(0, 256, dtype=np.float64) / 255
+            lut = (levels ** self._gamma) * (self._brightness / 100) * 255
+            self._output_lut = np.clip(np.floor(lut + 0.5), 0, 255).astype(np.uint8)
+
+        # Set the frame drawn so far again, so it changes on the next draw().
+        # update() still sends the next frame in full, as it needs drawing.
+        if self._frame is not None:
+            self.set_frame(np.array(self._frame, dtype=np.uint8))
+        self._last_frame = None
+
+    def get_output_colour(self, red, green, blue):
+        """
+        Returns a tuple of the colour adjusted for brightness and gamma.
+        Monochromatic devices only display green, so only that is processed.
+        """
+        lut = self._output_lut
+        if lut is None:
+            return (red, green, blue)
+
+        if self.monochromatic:
+            return (0, int(lut[green]), 0)
+
+        return (int(lut[red]), int(lut[green]), int(lut[blue]))
+
+    def get_output_frame(self, frame):
+        """
+        Returns the frame buffer adjusted for brightness and gamma. Monochromatic
+        devices only display green, so only that channel is processed.
+        """
+        lut = self._output_lut
+        if lut is None:
+            return frame
+
+        if self.monochromatic:
+            output = np.zeros_like(frame)
+            output[..., 1] = lut[frame[..., 1]]
+            return output
+
+        return lut[frame]
+
+    #######################################################
+    # Drawing more than one LED at once
+    #   Colours are arrays of (red, green, blue), and can be a single colour
+    #   for all LEDs. Anything outside the matrix is ignored.
+    #######################################################
+    def _get_frame_array(self, frame):
+        """
+        Returns a frame buffer as an array indexed as [y, x] = (red, green, blue).
+        Flat buffers (such as bytes) are read as rows of this matrix's width.
+        """
+        if isinstance(frame, np.ndarray):
+            frame = frame.astype(np.uint8, copy=False)
+        else:
+            try:
+                frame = np.frombuffer(memoryview(frame), dtype=np.uint8)
+            except TypeError:
+                frame = np.asarray(frame, dtype=np.uint8)
+
+        if frame.ndim == 1:
+            frame = frame.reshape(-1, self.cols, 3)
+
+        return frame
+
+    def blit(self, frame, x=0, y=0):
+        """
+        Copy a frame buffer onto the matrix with its top left corner at x, y.
+        This will be sent to the hardware on the next draw().
+
+        A frame covering the whole matrix is passed to set_frame(), so backends
+        that can accept whole frames will receive it at once.
+
+        Params:
+            frame       (array) NumPy array or nested lists indexed as frame[y][x] = (red, green, blue),
+                                or a buffer (e.g. bytes) of RGB values for whole rows.
+            x           (int)   Column to start from
+            y           (int)   Row to start from
+        """
+        frame = self._get_frame_array(frame)
+
+        # Clip to the matrix
+        if x < 0:
+            frame = frame[:, -x:]
+            x = 0
+        if y < 0:
+            frame = frame[-y:]
+            y = 0
+        frame = frame[:max(self.rows - y, 0), :max(self.cols - x, 0)]
+
+        if frame.shape[:2] == (self.rows, self.cols):
+            self.set_frame(frame)
+            return
+
+        for row_no, row in enumerate(frame.tolist()):
+            for col_no, rgb in enumerate(row):
+                red, green, blue = rgb
+                self.set(x + col_no, y + row_no, red, green, blue)
+
+    def fill(self, red=255, green=255, blue=255):
+        """
+        Set every LED to the same colour.
+        """
+        self.set_region(0, 0, self.cols, self.rows, (red, green, blue))
+
+    def set_row(self, y, colours):
+        """
+        Set the LEDs along a row, with either a colour for each LED or one colour for all.
+
+        Params:
+            y           (int)   Row number
+            colours     (list)  [red, green, blue] or [[red, green, blue], ...]
+        """
+        self.set_region(0, y, self.cols, 1, colours)
+
+    def set_col(self, x, colours):
+        """
+        Set the LEDs along a column, with either a colour for each LED or one colour for all.
+
+        Params:
+            x           (int)   Column number
+            colours     (list)  [red, green, blue] or [[red, green, blue], ...]
+        """
+        colours = np.asarray(colours, dtype=np.uint8)
+        if colours.ndim == 2:
+            colours = colours[:, np.newaxis]
+        self.set_region(x, 0, 1, self.rows, colours)
+
+    def set_region(self, x, y, width, height, colours):
+        """
+        Set a rectangle of LEDs, with either a colour for each LED or one colour for all.
+
+        Params:
+            x, y            (int)   Top left corner
+            width, height   (int)   Size of the rectangle
+            colours         (list)  [red, green, blue] or an array of colours, indexed as [y][x]
+        """
+        colours = np.broadcast_to(np.asarray(colours, dtype=np.uint8), (height, width, 3))
+        self.blit(colours, x, y)
 
     #######################################################
     # Functions for scripting
@@ -176,6 +499,117 @@ class FX(object):
         """
         return self.hex_to_rgb(self.lightness_hex(self.rgb_to_hex(rgb[0], rgb[1], rgb[2]), amount))
 
+    #######################################################
+    # Functions for scripting (batch)
+    #   These take and return arrays of colours, indexed as [..., (red, green, blue)],
+    #   such as a whole frame or a list of keys. Much faster than processing each
+    #   colour individually when tinting many LEDs every frame.
+    #######################################################
+    def _get_hue(self, rgb, value, diff):
+        """
+        Returns the hue (0 to 1) for an array of RGB floats. Used for both HSL and HSV.
+        """
+        red, green, blue = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+        diff = np.where(diff == 0, 1, diff)
+        hue = np.where(value == red, (green - blue) / diff,
+                       np.where(value == green, 2 + (blue - red) / diff, 4 + (red - green) / diff))
+        return (hue / 6) % 1
+
+    def _to_rgb_array(self, rgb):
+        """
+        Convert an array of RGB floats (0 to 1) to RGB integers (0 to 255),
+        rounding the same way as the colour module.
+        """
+        return np.floor(np.clip(rgb, 0, 1) * 255 + 0.5 - colour.FLOAT_ERROR).astype(np.uint8)
+
+    def rgb_to_hsl_array(self, rgb):
+        """
+        Converts an array of RGB integers into an array of HSL floats (0 to 1).
+
+        Input:  [[255, 0, 0], [0, 0, 255]]
+        Output: [[0, 1, 0.5], [0.667, 1, 0.5]]
+        """
+        rgb = np.asarray(rgb, dtype=np.float64) / 255
+        value = rgb.max(axis=-1)
+        total = value + rgb.min(axis=-1)
+        diff = value - rgb.min(axis=-1)
+        lightness = total / 2
+        divisor = np.where(lightness < 0.5, total, 2 - total)
+        saturation = np.where(diff == 0, 0, diff / np.where(divisor == 0, 1, divisor))
+        return np.stack([self._get_hue(rgb, value, diff), saturation, lightness], axis=-1)
+
+    def hsl_to_rgb_array(self, hsl):
+        """
+        Converts an array of HSL floats (0 to 1) into an array of RGB integers.
+        Hue outside 0 to 1 continues around the colour wheel.
+        """
+        hsl = np.asarray(hsl, dtype=np.float64)
+        hue, saturation, lightness = hsl[..., 0:1], hsl[..., 1:2], hsl[..., 2:3]
+        k = (np.array([0, 8, 4]) + (hue % 1) * 12) % 12
+        a = saturation * np.minimum(lightness, 1 - lightness)
+        rgb = lightness - a * np.clip(np.minimum(k - 3, 9 - k), -1, 1)
+        return self._to_rgb_array(rgb)
+
+    def rgb_to_hsv_array(self, rgb):
+        """
+        Converts an array of RGB integers into an array of HSV floats (0 to 1).
+        """
+        rgb = np.asarray(rgb, dtype=np.float64) / 255
+        value = rgb.max(axis=-1)
+        diff = value - rgb.min(axis=-1)
+        saturation = np.where(value == 0, 0, diff / np.where(value == 0, 1, value))
+        return np.stack([self._get_hue(rgb, value, diff), saturation, value], axis=-1)
+
+    def hsv_to_rgb_array(self, hsv):
+        """
+        Converts an array of HSV floats (0 to 1) into an array of RGB integers.
+        Hue outside 0 to 1 continues around the colour wheel.
+        """
+        hsv = np.asarray(hsv, dtype=np.float64)
+        hue, saturation, value = hsv[..., 0:1], hsv[..., 1:2], hsv[..., 2:3]
+        k = (np.array([5, 3, 1]) + (hue % 1) * 6) % 6
+        rgb = value - value * saturation * np.clip(np.minimum(k, 4 - k), 0, 1)
+        return self._to_rgb_array(rgb)
+
+    def saturate_array(self, rgb, amount):
+        """
+        Batch version of saturate_rgb(). Returns a new array of RGB integers.
+
+        Params:
+            rgb         (array) Array of RGB integers, e.g. [[255, 0, 0], [0, 255, 0]]
+            amount      (float) Relative amount to saturate (-1 to 1), or an array
+                                with an amount for each colour.
+        """
+        hsl = self.rgb_to_hsl_array(rgb)
+        hsl[..., 1] = np.clip(hsl[..., 1] + amount, 0, 1)
+        return self.hsl_to_rgb_array(hsl)
+
+    def hue_array(self, rgb, amount):
+        """
+        Batch version of hue_rgb(). Returns a new array of RGB integers.
+
+        Params:
+            rgb         (array) Array of RGB integers, e.g. [[255, 0, 0], [0, 255, 0]]
+            amount      (float) Relative amount to cycle hue (-1 to 1), or an array
+                                with an amount for each colour.
+        """
+        hsl = self.rgb_to_hsl_array(rgb)
+        hsl[..., 0] += amount
+        return self.hsl_to_rgb_array(hsl)
+
+    def lightness_array(self, rgb, amount):
+        """
+        Batch version of lightness_rgb(). Returns a new array of RGB integers.
+
+        Params:
+            rgb         (array) Array of RGB integers, e.g. [[255, 0, 0], [0, 255, 0]]
+            amount      (float) Relative amount to change lightness (-1 to 1), or an
+                                array with an amount for each colour.
+        """
+        hsl = self.rgb_to_hsl_array(rgb)
+        hsl[..., 2] = np.clip(hsl[..., 2] + amount, 0, 1)
+        return self.hsl_to_rgb_array(hsl)
+
     def gradient(self, colours=[], steps=0):
         """
         Return a list of colours that builds a gradient from start to finish
@@ -194,18 +628,18 @@ class FX(object):
         if len(colours) < 2:
             raise ValueError("Insufficient colours! At least 2 required to generate gradient.")
 
-        output = []
-        steps_between_stops = math.ceil(steps / (len(colours) - 1))
+        return list(_get_gradient(tuple(colours), steps)[0])
 
-        for index, item in enumerate(colours):
-            try:
-                next_colour = colours[index + 1]
-            except IndexError:
-                # This is the last colour
-                continue
+    def gradient_array(self, colours=[], steps=0):
+        """
+        Same as gradient(), but returns an array of RGB values indexed as
+        [step] = (red, green, blue), so colours can be picked by index or slice.
 
-            c = colour.Color(item)
-            for c2 in list(c.range_to(next_colour, steps_between_stops)):
-                output.append(c2.get_hex_l())
+        The array is shared between calls with the same parameters and cannot
+        be modified. Use .copy() if a modifiable array is needed.
 
-        return output
+        Params:
+            colours     (list)  List of colours for the gradient
+            steps       (int)   Total colours to return for rendering the gradient
+        """
+        return get_gradient_array(colours, steps)
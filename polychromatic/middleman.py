@@ -9,12 +9,16 @@ Refer to the online documentation for more details:
 https://docs.polychromatic.app/
 """
 
+import importlib
+import time
+
 from . import common, procpid
 from .backends._backend import Backend
-from .troubleshoot import openrazer as openrazer_troubleshoot
 
+# Troubleshooters are imported when they are used, as they have dependencies
+# (such as 'requests') that processes like the helper do not need.
 TROUBLESHOOT_MODULES = {
-    "openrazer": openrazer_troubleshoot.troubleshoot
+    "openrazer": "polychromatic.troubleshoot.openrazer"
 }
 
 
@@ -39,7 +43,7 @@ class Middleman(object):
         # List of backend string IDs that are not present.
         self.not_installed = []
 
-        # Dictionary of backend IDs referencing troubleshoot() functions, if available.
+        # Dictionary of backend IDs referencing modules with a troubleshoot() function, if available.
         #   e.g. "openrazer": TROUBLESHOOT_MODULES.get("openrazer")
         self.troubleshooters = {}
 
@@ -60,7 +64,8 @@ class Middleman(object):
         try:
             import polychromatic.backends.openrazer as openrazer_backend
             backend = openrazer_backend.OpenRazerBackend(self._base)
-            if backend.init():
+            backend.on_devices_changed = self.invalidate_cache
+            if backend.init() is True:
                 self.backends.append(backend)
             else:
                 self.bad_init.append(backend)
@@ -75,6 +80,38 @@ class Middleman(object):
             # Backend does not have a troubleshooter.
             pass
 
+    def wait_for_backends(self, timeout, poll_interval=2):
+        """
+        Wait for backends that failed to initialise (for example, their daemon
+        is still starting when the user logs in) and initialise them again
+        once they are available. Backends that can't notify when their daemon
+        starts are retried every 'poll_interval' seconds.
+
+        Returns once all backends are ready or 'timeout' seconds have passed.
+        """
+        deadline = time.monotonic() + timeout
+
+        for backend in list(self.bad_init):
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+
+                ready = backend.wait_for_daemon(remaining)
+                if ready is None:
+                    time.sleep(min(poll_interval, remaining))
+                elif not ready:
+                    break
+
+                if backend.init() is True:
+                    self.bad_init.remove(backend)
+                    self.backends.append(backend)
+                    break
+
+                # Daemon is running, but the backend still can't use it
+                if ready:
+                    break
+
     def get_backend(self, device):
         """
         Returns the backend object for the specified device.
@@ -214,10 +251,11 @@ class Middleman(object):
             False           Troubleshooter failed
         """
         try:
-            return self.troubleshooters[backend](i18n, fn_progress_set_max, fn_progress_advance)
+            module = importlib.import_module(self.troubleshooters[backend])
         except KeyError:
             # Troubleshooter not available for this backend
             return None
+        return module.troubleshoot(i18n, fn_progress_set_max, fn_progress_advance)
         # TODO: Catch errors via interfaces
 
     def restart(self, backend):
@@ -305,8 +343,12 @@ class Middleman(object):
         state = procpid.DeviceSoftwareState(device.serial)
         effect = state.get_effect()
         if effect:
-            procmgr = procpid.ProcessManager("helper")
-            procmgr.start_component(["--run-fx", effect["path"], "--device-serial", device.serial])
+            reply = procpid.EffectHelperClient().play(effect["path"], [device.serial])
+            if not reply:
+                procmgr = procpid.ProcessManager("helper")
+                procmgr.start_component(["--run-fx", effect["path"], "--device-serial", device.serial])
+            elif not reply["ok"]:
+                self._base.dbg.stdout("Failed to replay effect: " + reply["error"], self._base.dbg.error)
             return
 
         # Was the device running a hardware effect?
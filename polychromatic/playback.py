@@ -0,0 +1,882 @@
+# Polychromatic is licensed under the GPLv3.
+# Copyright (C) 2024 Luke Horwell <code@horwell.me>
+"""
+Prepares custom software effects for playback by the helper process.
+
+Effects are saved in a format that is easy to edit, but expensive to parse
+repeatedly. Before playback starts, the effect is converted into dense frame
+buffers (rows × cols × RGB) so the helper only has to hand over a prebuilt
+buffer to the device on each frame.
+
+These buffers are cached on disk (see EffectCache) so they can be reused the
+next time the effect is played.
+"""
+
+import colorsys
+import glob
+import hashlib
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+from . import animation, common, effects, fileman, fx
+from .base import PolychromaticBase
+
+# How FrameScheduler() handles frames that are running late
+SCHEDULE_SKIP = 0           # Drop late frames to stay in time with the clock
+SCHEDULE_DELAY = 1          # Play every frame, delaying the frames that follow
+
+# Layered effects are computed, so they are rendered at a fixed rate
+LAYERED_FPS = 30
+
+# AdaptiveRate: Portion of the frame period that drawing may use, the number of
+# frames over this before lowering the frame rate, and the seconds within budget
+# (at the higher rate) before raising it again
+DRAW_BUDGET = 0.75
+THROTTLE_FRAMES = 10
+RECOVER_SECONDS = 5
+THROTTLE_MIN_FPS = 5
+
+# Number of recent frames kept for statistics (PlaybackStats)
+STATS_WINDOW = 600
+
+# Histogram buckets in milliseconds. Values below the first (negative slack,
+# meaning the frame was late) and above the last are counted separately.
+STATS_BUCKETS_MS = [0, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250]
+
+# Seconds to wait before devices started together show their first frame
+SYNC_START_DELAY = 0.1
+
+# Sequences with "interpolate" enabled are rendered at this rate (or their own, if higher)
+INTERPOLATED_FPS = 60
+
+# Number of steps for precomputed gradients and colour wheels
+LUT_SIZE = 256
+
+# Scripted effects run at this rate unless the script sets 'FPS'
+SCRIPTED_FPS = 30
+
+# Portion of the frame period a script may use before its frame rate is lowered,
+# and the number of consecutive frames over budget that triggers this
+SCRIPT_BUDGET = 0.5
+SCRIPT_BUDGET_STRIKES = 5
+SCRIPT_MIN_FPS = 1
+
+
+def compile_sequence(frames, rows, cols):
+    """
+    Convert the frames of a sequence effect into frame buffers.
+
+    Params:
+        frames      (list)  Frames from the effect data: [{"x": {"y": "#RRGGBB"}}]
+        rows        (int)   Number of rows on the device's matrix
+        cols        (int)   Number of columns on the device's matrix
+
+    Returns a numpy array of shape (frames, rows, cols, 3) using uint8 values.
+    Positions that are not stored in a frame (or are outside the matrix) are off.
+    """
+    buffers = np.zeros((len(frames), rows, cols, 3), dtype=np.uint8)
+    rgb_cache = {}
+
+    for index, frame in enumerate(frames):
+        for x in frame.keys():
+            col = int(x)
+            if col < 0 or col >= cols:
+                continue
+
+            for y in frame[x].keys():
+                row = int(y)
+                if row < 0 or row >= rows:
+                    continue
+
+                hex_value = frame[x][y]
+                try:
+                    rgb = rgb_cache[hex_value]
+                except KeyError:
+                    rgb = common.hex_to_rgb(hex_value)
+                    rgb_cache[hex_value] = rgb
+
+                buffers[index, row, col] = rgb
+
+    return buffers
+
+
+def is_static_sequence(frames):
+    """
+    Returns a boolean to indicate every frame is identical, so playing the
+    sequence (when looped) would never change the output.
+
+    Params:
+        frames      (array) Frames from compile_sequence()
+    """
+    if len(frames) == 0:
+        return False
+    return bool((frames == frames[0]).all())
+
+
+class SequenceInterpolator(object):
+    """
+    Renders a sequence between its authored frames by cross-fading
+    from one frame to the next, so low frame rate effects play smoothly
+    at a higher output rate.
+    """
+    def __init__(self, frames, looped):
+        """
+        Params:
+            frames      (array) Frames from compile_sequence()
+            looped      (bool)  Whether the last frame fades back into the first
+        """
+        self.frames = frames
+        self.looped = looped
+        self._blend = np.empty(frames.shape[1:], dtype=np.float32)
+        self._output = np.empty(frames.shape[1:], dtype=np.uint8)
+
+    def render(self, position):
+        """
+        Returns the frame at a (fractional) frame number. For example, 2.25 is a
+        quarter of the way from frame 2 to 3.
+        """
+        total = len(self.frames)
+        current = int(position)
+        amount = position - current
+
+        if self.looped:
+            current = current % total
+            following = (current + 1) % total
+        else:
+            current = min(current, total - 1)
+            following = min(current + 1, total - 1)
+
+        if amount == 0 or current == following:
+            return self.frames[current]
+
+        # current + (following - current) * amount
+        np.subtract(self.frames[following], self.frames[current], out=self._blend, dtype=np.float32)
+        self._blend *= amount
+        self._blend += self.frames[current]
+        np.rint(self._blend, out=self._blend)
+        np.copyto(self._output, self._blend, casting="unsafe")
+        return self._output
+
+
+def compile_layer_masks(layers, rows, cols):
+    """
+    Convert the positions of each layer into a boolean array of the LEDs
+    belonging to that layer. Positions are stored as [x, y] pairs. Those
+    outside the matrix are ignored.
+
+    Params:
+        layers      (list)  "layers" from the effect data
+        rows        (int)   Number of rows on the device's matrix
+        cols        (int)   Number of columns on the device's matrix
+
+    Returns:
+        (array)     Booleans with the shape (layers, rows, cols)
+    """
+    masks = np.zeros((len(layers), rows, cols), dtype=bool)
+    for index, layer in enumerate(layers):
+        for position in layer["positions"]:
+            x, y = int(position[0]), int(position[1])
+            if 0 <= x < cols and 0 <= y < rows:
+                masks[index, y, x] = True
+    return masks
+
+
+class FrameScheduler(object):
+    """
+    Paces playback using absolute deadlines from a monotonic clock. Frame N is
+    due at (start + N / fps), so the time spent drawing a frame does not add to
+    the frame period and playback speed stays consistent.
+
+    When the device (or daemon) cannot keep up, the policy decides whether
+    late frames are dropped (SCHEDULE_SKIP) or played late (SCHEDULE_DELAY).
+    Either way, the number of frames that missed their deadline is counted.
+    """
+    def __init__(self, fps, policy=SCHEDULE_SKIP, clock=time.monotonic, sleep=time.sleep):
+        """
+        Params:
+            fps         (int)       Frames per second to play at
+            policy      (int)       One of SCHEDULE_* variables
+            clock       (function)  Returns the current time in seconds
+            sleep       (function)  Waits for the specified number of seconds
+        """
+        self.fps = fps
+        self.interval = 1 / fps
+        self.policy = policy
+        self.frames_missed = 0
+        self.slack = 0
+        self._clock = clock
+        self._sleep = sleep
+        self._start = None
+        self._frame = -1
+
+    def start(self, start_time=None):
+        """
+        Begin counting frames from now, or the specified time on the clock.
+        Schedulers sharing the same start time play each frame at the same instant.
+
+        If the start time has already passed, playback joins at the frame
+        that is currently due, without counting the earlier frames as missed.
+        """
+        now = self._clock()
+        self._start = now if start_time is None else start_time
+        self._frame = -1
+        self.frames_missed = 0
+
+        if self._start < now:
+            self._frame = int((now - self._start) / self.interval) - 1
+
+    def next_frame(self):
+        """
+        Wait until the next frame is due, then return its number (counting from 0).
+        The time that was left to wait is stored in 'slack' (negative if late).
+
+        If deadlines were missed, the frame number may jump ahead (SCHEDULE_SKIP)
+        or the timeline is shifted back for the frames that follow (SCHEDULE_DELAY).
+        """
+        if self._start is None:
+            self.start()
+
+        frame = self._frame + 1
+        deadline = self._start + (frame * self.interval)
+        now = self._clock()
+        self.slack = deadline - now
+
+        if now < deadline:
+            self._sleep(deadline - now)
+        else:
+            behind = int((now - deadline) / self.interval)
+            if behind > 0:
+                self.frames_missed += behind
+                if self.policy == SCHEDULE_SKIP:
+                    frame += behind
+                else:
+                    self._start = now - (frame * self.interval)
+
+        self._frame = frame
+        return frame
+
+    def resume(self):
+        """
+        Continue after a pause, as if no time had passed since the last frame.
+        The next frame is due immediately.
+        """
+        self._start = self._clock() - ((self._frame + 1) * self.interval)
+
+    def set_fps(self, fps):
+        """
+        Change the frame rate, staying on the same timeline. Frame numbers are
+        counted at the new rate, so the time of a frame is still (frame / fps).
+        """
+        self.fps = fps
+        self.interval = 1 / fps
+        if self._start is not None:
+            self._frame = int((self._clock() - self._start) / self.interval)
+
+
+class AdaptiveRate(object):
+    """
+    Lowers the frame rate for devices that can't draw frames as quickly as the
+    effect asks for (such as wireless devices), then raises it again once the
+    device has caught up.
+
+    The time taken to draw is smoothed over recent frames. When it keeps using
+    more than DRAW_BUDGET of the frame period, the rate is lowered to one the
+    device can sustain. After drawing fits in the budget of a higher rate for
+    RECOVER_SECONDS, the rate is raised by a step, up to the target.
+    """
+    def __init__(self, fps, min_fps=THROTTLE_MIN_FPS):
+        """
+        Params:
+            fps         (int)   Frames per second requested by the effect
+            min_fps     (int)   Never lower the rate below this
+        """
+        self.target_fps = fps
+        self.fps = fps
+        self.min_fps = min(min_fps, fps)
+        self.draw_time = None
+        self._frames_over = 0
+        self._frames_under = 0
+
+    def set_target(self, fps):
+        """
+        Change the highest rate to play at. Returns the new rate.
+        """
+        self.target_fps = fps
+        self.min_fps = min(self.min_fps, fps)
+        self.fps = min(self.fps, fps)
+        return self.fps
+
+    def add_draw(self, seconds):
+        """
+        Record how long a frame took to draw. Frames that weren't drawn (because
+        nothing changed) should not be counted.
+
+        Returns the new frame rate if it should change, otherwise None.
+        """
+        if self.draw_time is None:
+            self.draw_time = seconds
+        else:
+            self.draw_time = (self.draw_time * 0.9) + (seconds * 0.1)
+
+        if self.draw_time > DRAW_BUDGET / self.fps:
+            self._frames_under = 0
+            self._frames_over += 1
+            if self._frames_over < THROTTLE_FRAMES or self.fps <= self.min_fps:
+                return None
+
+            self._frames_over = 0
+            sustainable_fps = int(DRAW_BUDGET / self.draw_time)
+            self.fps = max(min(sustainable_fps, self.fps - 1), self.min_fps)
+            return self.fps
+
+        self._frames_over = 0
+        if self.fps >= self.target_fps:
+            return None
+
+        # Only recover if the next step up would also be within budget
+        next_fps = min(math.ceil(self.fps * 1.25), self.target_fps)
+        if self.draw_time > DRAW_BUDGET / next_fps:
+            self._frames_under = 0
+            return None
+
+        self._frames_under += 1
+        if self._frames_under < RECOVER_SECONDS * self.fps:
+            return None
+
+        self._frames_under = 0
+        self.fps = next_fps
+        return self.fps
+
+
+class PlaybackStats(object):
+    """
+    Records timings for recently played frames, to see which devices (or
+    effects) can't keep up:
+
+    - Build: Time to prepare the frame (render, interpolate or run the script)
+    - Draw: Time to send the frame to the device
+    - Slack: Time left before the frame was due, negative if it was late
+    - Dropped: Frames skipped for running late
+    - Draws skipped: Frames not sent as they were identical to the last
+    """
+    def __init__(self, fps, window=STATS_WINDOW):
+        """
+        Params:
+            fps         (int)   Frames per second requested by the effect
+            window      (int)   Number of recent frames to keep
+        """
+        self.fps = fps
+        self.frames = 0
+        self.frames_dropped = 0
+        self.draws_skipped = 0
+        self._window = window
+
+        # Columns: build, draw, slack, timestamp (all in seconds)
+        self._samples = np.zeros((window, 4), dtype=np.float64)
+
+    def add_frame(self, build, draw, slack, timestamp, frames_dropped, drawn=True):
+        """
+        Record the timings of a frame.
+
+        Params:
+            build           (float) Seconds spent preparing the frame
+            draw            (float) Seconds spent sending the frame to the device
+            slack           (float) Seconds before the frame was due (FrameScheduler.slack)
+            timestamp       (float) Time on the monotonic clock when drawing finished
+            frames_dropped  (int)   Total frames skipped so far (FrameScheduler.frames_missed)
+            drawn           (bool)  False if the frame was identical and not sent (FX.update)
+        """
+        self._samples[self.frames % self._window] = (build, draw, slack, timestamp)
+        self.frames += 1
+        self.frames_dropped = frames_dropped
+        if not drawn:
+            self.draws_skipped += 1
+
+    def get_summary(self):
+        """
+        Returns a dictionary summarising the recent frames, suitable for JSON:
+        {
+            "fps": 30,                  Requested frame rate
+            "fps_actual": 29.8,         Measured frame rate
+            "frames": 1234,             Total frames played
+            "frames_dropped": 2,        Total frames skipped
+            "draws_skipped": 500,       Total frames not sent for being identical
+            "buckets_ms": [...],        STATS_BUCKETS_MS
+            "build": {
+                "mean_ms", "p50_ms", "p95_ms", "max_ms",
+                "histogram": [...]      Frames below, between and above each bucket
+            },
+            "draw": { ... },
+            "slack": { ... }
+        }
+        """
+        count = min(self.frames, self._window)
+        samples = self._samples[:count]
+        summary = {
+            "fps": self.fps,
+            "fps_actual": 0,
+            "frames": self.frames,
+            "frames_dropped": self.frames_dropped,
+            "draws_skipped": self.draws_skipped,
+            "buckets_ms": STATS_BUCKETS_MS,
+        }
+
+        if count > 1:
+            duration = samples[:, 3].max() - samples[:, 3].min()
+            if duration > 0:
+                summary["fps_actual"] = round((count - 1) / duration, 2)
+
+        for column, name in enumerate(["build", "draw", "slack"]):
+            values = samples[:, column] * 1000
+            buckets = np.searchsorted(STATS_BUCKETS_MS, values, side="right")
+            summary[name] = {
+                "mean_ms": round(float(values.mean()), 3) if count else 0,
+                "p50_ms": round(float(np.percentile(values, 50)), 3) if count else 0,
+                "p95_ms": round(float(np.percentile(values, 95)), 3) if count else 0,
+                "max_ms": round(float(values.max()), 3) if count else 0,
+                "histogram": np.bincount(buckets, minlength=len(STATS_BUCKETS_MS) + 1).tolist(),
+            }
+
+        return summary
+
+
+class LayeredRenderer(object):
+    """
+    Composites the layers of a layered effect into frame buffers.
+
+    When the effect loads, each layer's positions are converted into a mask and
+    anything that doesn't change over time (like gradients) is precomputed.
+    On each frame, a layer computes the colours for all of its LEDs at once
+    and is blended over the layers before it, starting from the first layer.
+
+    Layer properties (all optional):
+        colour          (str)   LAYER_STATIC, LAYER_PULSING
+        colours         (list)  LAYER_GRADIENT, LAYER_WAVE, LAYER_CYCLE
+        direction       (str)   LAYER_GRADIENT, LAYER_WAVE: "right", "left", "down" or "up"
+        speed           (float) LAYER_PULSING, LAYER_WAVE, LAYER_SPECTRUM, LAYER_CYCLE: Seconds per cycle
+        easing          (str)   LAYER_PULSING, LAYER_CYCLE: Key from animation.EASINGS for
+                                fading between colours (default "sine_in_out" or "linear")
+        opacity         (float) All layers: 0 (transparent) to 1 (opaque)
+    """
+    def __init__(self, layers, rows, cols, masks=None):
+        """
+        Params:
+            layers      (list)  "layers" from the effect data
+            rows        (int)   Number of rows on the device's matrix
+            cols        (int)   Number of columns on the device's matrix
+            masks       (array) Optional. Masks from compile_layer_masks()
+        """
+        self.rows = rows
+        self.cols = cols
+        self._frame = np.zeros((rows, cols, 3), dtype=np.float32)
+
+        # Layers that could not be rendered, such as unknown layer types
+        self.unsupported_layers = []
+
+        # List of tuples: (mask, opacity, function returning colours for the mask)
+        self._layers = []
+
+        # Does the output change over time?
+        self.is_static = True
+
+        compilers = {
+            effects.LAYER_STATIC: self._compile_static,
+            effects.LAYER_GRADIENT: self._compile_gradient,
+            effects.LAYER_PULSING: self._compile_pulsing,
+            effects.LAYER_WAVE: self._compile_wave,
+            effects.LAYER_SPECTRUM: self._compile_spectrum,
+            effects.LAYER_CYCLE: self._compile_cycle,
+        }
+
+        if masks is None:
+            masks = compile_layer_masks(layers, rows, cols)
+
+        for layer, mask in zip(layers, masks):
+            properties = layer["properties"]
+            try:
+                compiler = compilers[layer["type"]]
+            except KeyError:
+                self.unsupported_layers.append(layer)
+                continue
+
+            if not mask.any():
+                continue
+
+            opacity = min(max(float(properties.get("opacity", 1)), 0), 1)
+            self._layers.append((mask, opacity, compiler(mask, properties)))
+
+    @staticmethod
+    def _get_rgb(hex_value):
+        return np.array(common.hex_to_rgb(hex_value), dtype=np.float32)
+
+    def _get_colours(self, properties, default):
+        """
+        Returns the layer's list of colours, or the default if there are none.
+        """
+        colours = properties.get("colours")
+        if not isinstance(colours, list) or not colours:
+            return default
+        return colours
+
+    def _get_gradient_lut(self, colours, cyclic=False):
+        """
+        Returns an array of (about) LUT_SIZE colours blending between the colours,
+        the same as FX.gradient_array(). A cyclic gradient blends back into the
+        first colour.
+        """
+        colours = list(colours)
+        if cyclic:
+            colours.append(colours[0])
+
+        if len(colours) == 1:
+            return np.tile(self._get_rgb(colours[0]), (LUT_SIZE, 1))
+
+        return fx.get_gradient_array(colours, LUT_SIZE).astype(np.float32)
+
+    def _get_mask_offsets(self, mask, direction):
+        """
+        Returns the position of each LED in the mask relative to the layer's
+        bounding area (0 to 1) in the specified direction.
+        """
+        ys, xs = np.nonzero(mask)
+        axis = ys if direction in ["up", "down"] else xs
+        span = axis.max() - axis.min()
+        offsets = (axis - axis.min()) / span if span > 0 else np.zeros(len(axis))
+        if direction in ["left", "up"]:
+            offsets = 1 - offsets
+        return offsets.astype(np.float32)
+
+    def _get_speed(self, properties):
+        speed = float(properties.get("speed", 2))
+        return speed if speed > 0 else 2
+
+    def _get_curve(self, properties, default):
+        """
+        Returns the easing curve for fading between colours, sampled as LUT_SIZE steps.
+        """
+        easing = properties.get("easing", default)
+        if easing not in animation.EASINGS:
+            easing = default
+        return animation.get_curve(easing, LUT_SIZE)
+
+    def _compile_static(self, mask, properties):
+        colour = self._get_rgb(properties.get("colour", "#00FF00"))
+        return lambda seconds: colour
+
+    def _compile_gradient(self, mask, properties):
+        lut = self._get_gradient_lut(self._get_colours(properties, ["#00FF00", "#0000FF"]))
+        offsets = self._get_mask_offsets(mask, properties.get("direction", "right"))
+        colours = lut[(offsets * (len(lut) - 1)).astype(np.intp)]
+        return lambda seconds: colours
+
+    def _compile_pulsing(self, mask, properties):
+        self.is_static = False
+        colour = self._get_rgb(properties.get("colour", "#00FF00"))
+        speed = self._get_speed(properties)
+        curve = self._get_curve(properties, "sine_in_out")
+
+        def _render(seconds):
+            # Fades in for the first half of the cycle, then back out
+            position = (seconds / speed) % 1 * 2
+            progress = position if position <= 1 else 2 - position
+            return colour * curve[int(progress * (LUT_SIZE - 1))]
+
+        return _render
+
+    def _compile_wave(self, mask, properties):
+        self.is_static = False
+        lut = self._get_gradient_lut(self._get_colours(properties, ["#FF0000", "#00FF00", "#0000FF"]), cyclic=True)
+        offsets = self._get_mask_offsets(mask, properties.get("direction", "right"))
+        speed = self._get_speed(properties)
+
+        def _render(seconds):
+            positions = (offsets - (seconds / speed)) % 1
+            return lut[(positions * (len(lut) - 1)).astype(np.intp)]
+
+        return _render
+
+    def _compile_spectrum(self, mask, properties):
+        self.is_static = False
+        speed = self._get_speed(properties)
+        lut = np.array([colorsys.hsv_to_rgb(step / LUT_SIZE, 1, 1) for step in range(0, LUT_SIZE)], dtype=np.float32) * 255
+
+        def _render(seconds):
+            return lut[int((seconds / speed) % 1 * LUT_SIZE) % LUT_SIZE]
+
+        return _render
+
+    def _compile_cycle(self, mask, properties):
+        colours = [self._get_rgb(value) for value in self._get_colours(properties, ["#FF0000", "#00FF00", "#0000FF"])]
+        if len(colours) == 1:
+            return lambda seconds: colours[0]
+
+        self.is_static = False
+        speed = self._get_speed(properties)
+        curve = self._get_curve(properties, "linear")
+
+        def _render(seconds):
+            position = (seconds / speed) % len(colours)
+            index = int(position)
+            blend = curve[int((position - index) * (LUT_SIZE - 1))]
+            return colours[index] * (1 - blend) + colours[(index + 1) % len(colours)] * blend
+
+        return _render
+
+    def render(self, seconds):
+        """
+        Returns a frame buffer (rows, cols, 3) of the effect at the specified
+        number of seconds since it started playing.
+        """
+        frame = self._frame
+        frame.fill(0)
+
+        for mask, opacity, function in self._layers:
+            colours = function(seconds)
+            if opacity >= 1:
+                frame[mask] = colours
+            else:
+                frame[mask] = (frame[mask] * (1 - opacity)) + (colours * opacity)
+
+        return frame.round().astype(np.uint8)
+
+
+class ScriptedRuntime(object):
+    """
+    Runs the Python script that accompanies a scripted effect.
+
+    The script is loaded once. Before it runs, the 'fx' object (the device's
+    matrix) and the 'animation' module (for easing curves and tweens) are
+    provided as global variables, along with each of the effect's parameters,
+    named after their "var" key. The script must define a function
+    that is called for each frame, after which the frame is drawn:
+
+        def on_frame(frame):
+            fx.set(frame % fx.cols, 0, 0, 255, 0)
+
+    The script may set 'FPS' to change its frame rate. Each frame is timed, and
+    if the script keeps exceeding its share of the frame period (SCRIPT_BUDGET),
+    the frame rate is lowered so a slow script can't stall the device.
+    """
+    def __init__(self, script_path, matrix, parameters, clock=time.monotonic):
+        """
+        Params:
+            script_path (str)       Path to the effect's .py file
+            matrix      (obj)       Backend.DeviceItem.Matrix() object
+            parameters  (list)      "parameters" from the effect data
+            clock       (function)  Returns the current time in seconds
+
+        Exceptions from the script are raised to the caller.
+        """
+        self.matrix = matrix
+        self._clock = clock
+
+        with open(script_path, "r") as f:
+            code = compile(f.read(), script_path, "exec")
+
+        self.namespace = {
+            "__name__": "__polychromatic_effect__",
+            "__file__": script_path,
+            "fx": matrix,
+            "animation": animation,
+            "FPS": SCRIPTED_FPS,
+        }
+        self.parameters = []
+        for param in parameters:
+            self.namespace[param["var"]] = param["value"]
+            self.parameters.append(param["var"])
+
+        exec(code, self.namespace)
+
+        self._on_frame = self.namespace.get("on_frame")
+        if not callable(self._on_frame):
+            raise AttributeError("Effect script does not define an on_frame(frame) function: " + script_path)
+
+        self.fps = max(int(self.namespace["FPS"]), SCRIPT_MIN_FPS)
+        self.frame = -1
+        self.last_duration = 0
+        self._strikes = 0
+
+    def set_parameter(self, var, value):
+        """
+        Change the value of one of the effect's parameters, which the script
+        will see from the next frame.
+
+        Returns a boolean to indicate the parameter exists.
+        """
+        if var not in self.parameters:
+            return False
+        self.namespace[var] = value
+        return True
+
+    def get_budget(self):
+        """
+        Returns the number of seconds the script may use for each frame.
+        """
+        return (1 / self.fps) * SCRIPT_BUDGET
+
+    def run_frame(self, frame=None):
+        """
+        Call the script's on_frame() function and measure how long it takes.
+
+        Params:
+            frame       (int)   Optional. Frame number from the FrameScheduler,
+                                so the script stays on the shared clock when
+                                frames are skipped. Otherwise, counts up by one.
+
+        Returns a boolean to indicate whether the frame rate was lowered because
+        the script has been consistently running over its budget.
+        """
+        self.frame = self.frame + 1 if frame is None else frame
+        start = self._clock()
+        self._on_frame(self.frame)
+        self.last_duration = self._clock() - start
+
+        if self.last_duration <= self.get_budget():
+            self._strikes = 0
+            return False
+
+        self._strikes += 1
+        if self._strikes < SCRIPT_BUDGET_STRIKES or self.fps <= SCRIPT_MIN_FPS:
+            return False
+
+        # Lower to a rate the script can sustain within its budget
+        sustainable_fps = int(SCRIPT_BUDGET / self.last_duration)
+        self.fps = max(min(sustainable_fps, self.fps - 1), SCRIPT_MIN_FPS)
+        self._strikes = 0
+        return True
+
+
+class EffectCache(PolychromaticBase):
+    """
+    Stores effects compiled for playback, so they don't need to be parsed
+    and validated again the next time they are played (such as resuming
+    effects when logging in).
+
+    Each effect is stored as two files:
+        <key>.json      Validated effect data, without the frames.
+        <key>.npy       Frames (sequence) or layer masks (layered) that can
+                        be memory mapped.
+
+    The key is made from the effect's path, its modification time, the save
+    format and the matrix dimensions, so a cached effect is never used once the
+    file has changed. The "parsed" keys (such as the localised name) are not
+    stored, as they depend on the user's locale, and are added when loaded.
+    """
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir if cache_dir else common.paths.effects_cache
+
+    def _get_path_hash(self, path):
+        """
+        Returns the name that all cache entries for an effect's path start with.
+        """
+        return hashlib.sha1(os.path.realpath(path).encode("utf-8")).hexdigest()
+
+    def _get_cache_prefix(self, path, rows, cols):
+        """
+        Returns the path (without extension) of the cache entry for an effect.
+        Entries for older revisions of the effect start with the same name,
+        up to the last hyphen.
+        """
+        path_hash = self._get_path_hash(path)
+        stamp = "{0}:{1}".format(os.stat(path).st_mtime_ns, fileman.VERSION)
+        stamp_hash = hashlib.sha1(stamp.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{path_hash}-{rows}x{cols}-{stamp_hash}")
+
+    def _remove_entries(self, pattern):
+        """
+        Remove cache files matching the glob pattern.
+        """
+        for old_file in glob.glob(pattern):
+            # Another process may be writing (or removing) entries at the same time
+            if old_file.endswith(".tmp"):
+                continue
+            try:
+                os.remove(old_file)
+            except FileNotFoundError:
+                pass
+
+    def load(self, path, rows, cols):
+        """
+        Load an effect for playback on a matrix with the specified dimensions.
+        If the effect isn't cached (or has changed), it is compiled and cached.
+
+        Returns a tuple:
+            (data, buffer)      data   = Effect data (without "frames"), or
+                                         one of ERROR_* from the fileman module.
+                                buffer = Array of frames (sequence) or layer masks
+                                         (layered), otherwise None.
+        """
+        try:
+            prefix = self._get_cache_prefix(path, rows, cols)
+        except OSError:
+            return (fileman.ERROR_MISSING_FILE, None)
+
+        try:
+            with open(prefix + ".json", "r") as f:
+                data = json.load(f)
+            buffer = None
+            if data["type"] in [effects.TYPE_SEQUENCE, effects.TYPE_LAYERED]:
+                buffer = np.load(prefix + ".npy", mmap_mode="r")
+            data["parsed"] = effects.EffectFileManagement()._get_parsed_keys(data, path)
+            return (data, buffer)
+        except (OSError, ValueError, KeyError):
+            pass
+
+        return self.compile(path, rows, cols)
+
+    def compile(self, path, rows, cols):
+        """
+        Validate and compile an effect, replacing the previous cache entry for
+        this effect (if any).
+
+        Returns the same as load().
+        """
+        data = effects.EffectFileManagement().get_item(path)
+        if isinstance(data, int):
+            return (data, None)
+
+        buffer = None
+        if data["type"] == effects.TYPE_SEQUENCE:
+            buffer = compile_sequence(data.pop("frames"), rows, cols)
+        elif data["type"] == effects.TYPE_LAYERED:
+            buffer = compile_layer_masks(data["layers"], rows, cols)
+
+        # Caching is best-effort: the effect can still be played if it can't be stored
+        try:
+            self._store(path, rows, cols, data, buffer)
+        except OSError as e:
+            self.dbg.stdout("Could not cache compiled effect: {0} ({1})".format(path, str(e)), self.dbg.warning)
+
+        return (data, buffer)
+
+    def _store(self, path, rows, cols, data, buffer):
+        """
+        Write a compiled effect to the cache, replacing the previous entry for
+        this effect (if any).
+        """
+        prefix = self._get_cache_prefix(path, rows, cols)
+        self._remove_entries(prefix.rsplit("-", 1)[0] + "-*")
+
+        # Write to temporary files first, as another process may be reading these
+        tmp_suffix = ".{0}.tmp".format(os.getpid())
+        if buffer is not None:
+            with open(prefix + ".npy" + tmp_suffix, "wb") as f:
+                np.save(f, buffer)
+            os.replace(prefix + ".npy" + tmp_suffix, prefix + ".npy")
+
+        cached_data = dict(data)
+        cached_data.pop("parsed", None)
+        with open(prefix + ".json" + tmp_suffix, "w") as f:
+            json.dump(cached_data, f)
+        os.replace(prefix + ".json" + tmp_suffix, prefix + ".json")
+
+    def purge(self, path):
+        """
+        Remove all cache entries for an effect (for any matrix size), such as
+        when the effect is deleted or renamed.
+        """
+        self._remove_entries(os.path.join(self.cache_dir, self._get_path_hash(path) + "-*"))
@@ -9,11 +9,18 @@ import json
 import os
 import shutil
 import signal
+import socket
+import socketserver
 import subprocess
 from threading import Thread
 
 from . import common
 
+# Software effects for every device are played by a single helper process,
+# which registers itself under this name. Devices it is playing have their
+# own PID files that point to this process.
+FX_HELPER = "helper-fx"
+
 
 class ProcessManager():
     """
@@ -26,7 +33,7 @@ class ProcessManager():
     - USR1 "Reload"
       |- Controller           Refresh current device and/or device list.
       |- Tray                 Reload, device list changed.
-      |- Helper (FX)          Reload, current effect data changed.
+      |- Helper (FX)          Reload, check which devices should be playing effects.
       |- Helper (Triggers)    Reload, trigger data changed.
 
     - USR2 "Stop"
@@ -113,20 +120,23 @@ class ProcessManager():
 
         return pids
 
-    def set_component_pid(self):
+    def set_component_pid(self, pid=None):
         """
-        Assign the PID of the running process to a component or device, indicating
-        a 'locked' state to avoid multiple instances.
+        Assign the PID of the running process (or another process, such as the
+        effects helper) to a component or device, indicating a 'locked' state
+        to avoid multiple instances.
 
-        If the component is already running, it will be stopped.
+        If the component is already running in another process, it will be stopped.
         """
         pid_file = self._get_pid_file()
+        if not pid:
+            pid = os.getpid()
 
-        if os.path.exists(pid_file):
+        if os.path.exists(pid_file) and self._get_component_pid() != pid:
             self.stop()
 
         with open(pid_file, "w") as f:
-            f.write(str(os.getpid()))
+            f.write(str(pid))
 
         return True
 
@@ -153,9 +163,20 @@ class ProcessManager():
         Send the USR2 signal to the process to ask this component to stop.
         The PID will be unassigned, allowing it to be used by another
         Polychromatic process.
+
+        Devices played by the effects helper are unassigned here instead, and
+        the helper is sent USR1 to stop only that device.
         """
         pid = self._get_component_pid()
-        if pid:
+        if not pid:
+            return
+
+        if self.component != FX_HELPER and pid == ProcessManager(FX_HELPER)._get_component_pid():
+            if EffectHelperClient().stop(self.component):
+                return
+            os.remove(self._get_pid_file())
+            os.kill(pid, signal.SIGUSR1)
+        else:
             os.kill(pid, signal.SIGUSR2)
 
     def reload(self, pid_file=None):
@@ -248,6 +269,131 @@ class ProcessManager():
             procmgr.reload(pid_file)
 
 
+def get_socket_path(component):
+    """
+    Returns the path to the socket for a component that accepts commands.
+    """
+    return os.path.join(common.paths.pid_dir, component + ".sock")
+
+
+class ControlServer(object):
+    """
+    Accepts commands from other Polychromatic processes on a Unix socket.
+
+    Each line received is a JSON object with a "command" key, which is passed
+    to the handler function. Its return value (a dictionary with at least an
+    "ok" key) is sent back as a line of JSON. Requests are handled in their
+    own threads.
+    """
+    def __init__(self, socket_path, handler):
+        """
+        Params:
+            socket_path (str)       Path to create the socket
+            handler     (function)  Receives the request (dict) and returns the reply (dict)
+        """
+        self.socket_path = socket_path
+
+        class RequestHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        reply = handler(json.loads(line))
+                    except Exception as e:
+                        reply = {"ok": False, "error": str(e)}
+                    self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+        self._server = socketserver.ThreadingUnixStreamServer(socket_path, RequestHandler)
+        self._server.daemon_threads = True
+
+    def start(self):
+        """
+        Start accepting commands in a background thread.
+        """
+        # Sleep until a connection arrives, rather than polling for shutdown
+        Thread(target=self._server.serve_forever, args=(None,), daemon=True).start()
+
+    def close(self):
+        """
+        Stop accepting commands and remove the socket.
+        """
+        self._server.server_close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+class EffectHelperClient(object):
+    """
+    Controls the effects helper (which plays software effects for all devices)
+    through its socket, so effects can be changed without starting a new process.
+
+    Each function returns the reply as a dictionary, where "ok" indicates success
+    and "error" describes a failure. If the effects helper is not running,
+    None is returned instead.
+    """
+    def __init__(self, socket_path=None):
+        self.socket_path = socket_path if socket_path else get_socket_path(FX_HELPER)
+
+    def _send(self, request):
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(10)
+                sock.connect(self.socket_path)
+                sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+                with sock.makefile("rb") as f:
+                    return json.loads(f.readline())
+        except (OSError, ValueError):
+            return None
+
+    def play(self, path, serials=None, names=None):
+        """
+        Start (or switch to) an effect on the devices specified by their serial
+        and/or name. Devices are started together.
+        """
+        return self._send({"command": "play", "path": path, "serials": serials or [], "names": names or []})
+
+    def stop(self, serial):
+        """
+        Stop playing an effect on a device.
+        """
+        return self._send({"command": "stop", "serial": serial})
+
+    def pause(self, serial):
+        """
+        Pause the effect on a device, which continues to show the current frame.
+        """
+        return self._send({"command": "pause", "serial": serial})
+
+    def resume(self, serial):
+        """
+        Continue playing a paused effect from where it left off.
+        """
+        return self._send({"command": "resume", "serial": serial})
+
+    def set_parameter(self, serial, var, value):
+        """
+        Change the value of a parameter for a scripted effect while it is playing.
+        """
+        return self._send({"command": "set_parameter", "serial": serial, "var": var, "value": value})
+
+    def get_status(self):
+        """
+        Returns the reply with a "devices" key listing the devices being played:
+        [{"serial": "XX0000", "path": "/path/to/effect.json", "paused": False}, { ... }]
+        """
+        return self._send({"command": "status"})
+
+    def get_stats(self, serial=None):
+        """
+        Returns the reply with a "devices" key containing the frame timings for
+        each device being played (or only the specified device), keyed by serial.
+        See playback.PlaybackStats.get_summary() for the format.
+        """
+        return self._send({"command": "stats", "serial": serial})
+
+
 class DeviceSoftwareState(object):
     """
     Tracks the active custom software effect or preset for a specified device,
@@ -0,0 +1,44 @@
+#!/usr/bin/python3
+#
+# Compare the speed of converting colours between hex and RGB with the
+# previous implementations in common.py, for a 6x22 keyboard (132 LEDs).
+#
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+import polychromatic.common as common
+
+LEDS = 132
+RUNS = 2000
+
+
+def old_rgb_to_hex(rgb_list):
+    return "#{0:02X}{1:02X}{2:02X}".format(*rgb_list)
+
+
+def old_hex_to_rgb(hex_string):
+    hex_string = hex_string.lstrip("#")
+    return list(int(hex_string[i:i+2], 16) for i in (0, 2 ,4))
+
+
+rgb_list = [[random.randint(0, 255) for i in range(0, 3)] for led in range(0, LEDS)]
+hex_list = [old_rgb_to_hex(rgb) for rgb in rgb_list]
+buffer = bytes([value for rgb in rgb_list for value in rgb])
+
+tests = [
+    ("hex_to_rgb (previous)", lambda: [old_hex_to_rgb(value) for value in hex_list]),
+    ("hex_to_rgb", lambda: [common.hex_to_rgb(value) for value in hex_list]),
+    ("hex_list_to_rgb_buffer", lambda: common.hex_list_to_rgb_buffer(hex_list)),
+    ("rgb_to_hex (previous)", lambda: [old_rgb_to_hex(rgb) for rgb in rgb_list]),
+    ("rgb_to_hex", lambda: [common.rgb_to_hex(rgb) for rgb in rgb_list]),
+    ("rgb_buffer_to_hex_list", lambda: common.rgb_buffer_to_hex_list(buffer)),
+]
+
+print("Converting {0} colours, average of {1} runs".format(LEDS, RUNS))
+for name, function in tests:
+    seconds = timeit.timeit(function, number=RUNS) / RUNS
+    print(name.ljust(26), f"{seconds * 1000000:.1f} us".rjust(12))
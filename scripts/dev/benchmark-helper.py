@@ -0,0 +1,191 @@
+#!/usr/bin/python3
+#
+# Measure how quickly the helper starts playing a software effect, and how
+# much memory it needs to do so. Requires a connected device that supports
+# custom effects.
+#
+#   ./scripts/dev/benchmark-helper.py /path/to/effect.json <serial> [<serial> ...]
+#
+# Two cases are measured:
+#   - Cold start: no effects helper is running, so the new process becomes
+#     the effects helper and loads the backends.
+#   - Handover: the effects helper is running, so the new process passes the
+#     request over the socket and exits.
+#
+# The time to import the modules for each case is always measured, which
+# doesn't need a device. Cold start still loads the whole application
+# (including the backends and numpy), as it needs them to play the effect.
+#
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+import polychromatic.common as common
+import polychromatic.procpid as procpid
+from polychromatic.paths import Paths
+
+HELPER_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "polychromatic-helper")
+RUNS = 5
+TIMEOUT = 10
+
+# Modules imported before the handover, and when starting the effects helper
+HANDOVER_MODULES = ["polychromatic.common", "polychromatic.procpid", "polychromatic.paths"]
+COLD_MODULES = HANDOVER_MODULES + ["polychromatic.effects", "polychromatic.playback", "polychromatic.preferences", "polychromatic.base"]
+
+# Budgets (seconds, megabytes)
+BUDGET_HANDOVER_IMPORTS = 0.025
+BUDGET_COLD_FIRST_FRAME = 1.5
+BUDGET_COLD_RSS = 60
+BUDGET_HANDOVER_EXIT = 0.15
+BUDGET_HANDOVER_RSS = 25
+BUDGET_HANDOVER_FIRST_FRAME = 0.25
+
+common.paths = Paths()
+
+
+def get_import_time(modules):
+    """
+    Returns the seconds to import the modules in a new process, as reported
+    by Python's "-X importtime" option.
+    """
+    code = "import " + ", ".join(modules)
+    env = dict(os.environ, PYTHONPATH=os.path.join(os.path.dirname(__file__), "..", ".."))
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=env, capture_output=True, text=True).stderr
+
+    # Only count top level modules, which include the time of their imports
+    total = 0
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        cumulative, name = line.split("|")[1:]
+        if name.startswith(" polychromatic"):
+            total += int(cumulative)
+    return total / 1000000
+
+
+def get_peak_rss(pid):
+    """
+    Returns the peak resident memory (in MB) of a running process.
+    """
+    with open("/proc/{0}/status".format(pid)) as f:
+        for line in f.readlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0
+
+
+def wait_for_first_frame(serials, started):
+    """
+    Poll the effects helper until every device has drawn a frame, and return
+    the seconds since 'started'.
+    """
+    client = procpid.EffectHelperClient()
+    while time.monotonic() - started < TIMEOUT:
+        reply = client.get_stats()
+        if reply and reply.get("ok"):
+            devices = reply.get("devices", {})
+            if all(devices.get(serial, {}).get("frames", 0) > 0 for serial in serials):
+                return time.monotonic() - started
+        time.sleep(0.001)
+    print("Timed out waiting for the first frame")
+    sys.exit(1)
+
+
+def stop_effects_helper():
+    """
+    Stop the effects helper (if running) and wait for it to exit.
+    """
+    manager = procpid.ProcessManager(procpid.FX_HELPER)
+    pid = manager._get_component_pid()
+    if not pid:
+        return
+
+    manager.stop()
+    while os.path.exists("/proc/{0}".format(pid)):
+        time.sleep(0.01)
+
+
+def get_command(path, serials):
+    command = [sys.executable, HELPER_PATH, "--run-fx", path]
+    for serial in serials:
+        command += ["--device-serial", serial]
+    return command
+
+
+def benchmark_cold(path, serials):
+    """
+    Returns (time to first frame, peak RSS) for a new effects helper.
+    """
+    stop_effects_helper()
+    started = time.monotonic()
+    process = subprocess.Popen(get_command(path, serials))
+    first_frame = wait_for_first_frame(serials, started)
+    return (first_frame, get_peak_rss(process.pid))
+
+
+def benchmark_handover(path, serials):
+    """
+    Returns (time to exit, peak RSS, time to first frame) for a process that
+    hands the effect over to an already running effects helper.
+    """
+    for serial in serials:
+        procpid.EffectHelperClient().stop(serial)
+
+    started = time.monotonic()
+    process = subprocess.Popen(get_command(path, serials))
+    status, usage = os.wait4(process.pid, 0)[1:]
+    exited = time.monotonic() - started
+
+    if os.waitstatus_to_exitcode(status) != 0:
+        print("Helper did not hand over the effect")
+        sys.exit(1)
+
+    first_frame = wait_for_first_frame(serials, started)
+    return (exited, usage.ru_maxrss / 1024, first_frame)
+
+
+def print_result(label, value, budget, unit):
+    if unit == "ms":
+        value, budget = value * 1000, budget * 1000
+    result = "PASS" if value <= budget else "FAIL"
+    print(label.ljust(28), f"{value:.1f} {unit}".rjust(10), f"(budget {budget:.0f} {unit})".rjust(16), result)
+    return value <= budget
+
+
+def main():
+    handover_imports = min(get_import_time(HANDOVER_MODULES) for i in range(0, RUNS))
+    cold_imports = min(get_import_time(COLD_MODULES) for i in range(0, RUNS))
+
+    print("Best of {0} runs".format(RUNS))
+    result = print_result("Handover: imports", handover_imports, BUDGET_HANDOVER_IMPORTS, "ms")
+    print("Cold: imports".ljust(28), f"{cold_imports * 1000:.1f} ms".rjust(10))
+
+    if len(sys.argv) < 3:
+        print("To measure playback, run: {0} /path/to/effect.json <serial> [<serial> ...]".format(sys.argv[0]))
+        sys.exit(0 if result else 1)
+
+    path = os.path.realpath(sys.argv[1])
+    serials = sys.argv[2:]
+
+    cold = [benchmark_cold(path, serials) for i in range(0, RUNS)]
+    handover = [benchmark_handover(path, serials) for i in range(0, RUNS)]
+    stop_effects_helper()
+
+    # Report the best run, as others are affected by the system's caches
+    results = [
+        result,
+        print_result("Cold: first frame", min(run[0] for run in cold), BUDGET_COLD_FIRST_FRAME, "ms"),
+        print_result("Cold: peak RSS", min(run[1] for run in cold), BUDGET_COLD_RSS, "MB"),
+        print_result("Handover: exit", min(run[0] for run in handover), BUDGET_HANDOVER_EXIT, "ms"),
+        print_result("Handover: peak RSS", min(run[1] for run in handover), BUDGET_HANDOVER_RSS, "MB"),
+        print_result("Handover: first frame", min(run[2] for run in handover), BUDGET_HANDOVER_FIRST_FRAME, "ms"),
+    ]
+
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+#
+# Compare sending a frame to the OpenRazer client one LED at a time with
+# writing the whole frame at once. Requires the OpenRazer Python library, but
+# not the daemon or a device: frames are written to the client's buffer and
+# draw() is not sent, so this only measures the time spent in Python.
+#
+import os
+import sys
+import timeit
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+import numpy as np
+from openrazer.client.fx import Frame  # pylint: disable=import-error
+
+from polychromatic.backends._backend import Backend, BackendHelpers
+from polychromatic.backends.openrazer import OpenRazerBackend
+
+RUNS = 2000
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+
+# Name, rows, cols
+MATRICES = [
+    ("Keyboard", 6, 22),
+    ("Laptop", 6, 16),
+    ("DeathStalker Chroma", 1, 12),
+]
+
+
+def get_matrix(name, rows, cols):
+    """
+    Returns the backend's matrix object for a simulated device.
+    """
+    rdevice = SimpleNamespace()
+    rdevice.name = "Razer DeathStalker Chroma" if name == "DeathStalker Chroma" else "Razer " + name
+    rdevice.fx = SimpleNamespace(advanced=SimpleNamespace(rows=rows, cols=cols, matrix=Frame([rows, cols]), draw=lambda: None))
+
+    device = SimpleNamespace(name=rdevice.name, form_factor={"id": "keyboard"}, monochromatic=False)
+
+    # Only the matrix is needed, so the backend isn't connected to the daemon
+    backend = OpenRazerBackend.__new__(OpenRazerBackend)
+    backend.helpers = BackendHelpers()
+    backend._base = SimpleNamespace(paths=SimpleNamespace(data_dir=DATA_DIR))
+    return backend._get_matrix_object(rdevice, device)
+
+
+print("Average of {0} frames".format(RUNS))
+print("Matrix".ljust(28), "Per LED".rjust(12), "Whole frame".rjust(12))
+
+for name, rows, cols in MATRICES:
+    matrix = get_matrix(name, rows, cols)
+    frame = np.random.randint(0, 256, (matrix.rows, matrix.cols, 3), dtype=np.uint8)
+
+    per_led = timeit.timeit(lambda: Backend.DeviceItem.Matrix.set_frame(matrix, frame), number=RUNS) / RUNS
+    whole_frame = timeit.timeit(lambda: matrix.set_frame(frame), number=RUNS) / RUNS
+
+    # Both should produce the same buffer
+    expected = matrix._rdevice.fx.advanced.matrix._matrix.copy()
+    Backend.DeviceItem.Matrix.set_frame(matrix, frame)
+    if not np.array_equal(expected, matrix._rdevice.fx.advanced.matrix._matrix):
+        print("{0}: Whole frame differs from the per LED frame!".format(name))
+        sys.exit(1)
+
+    label = "{0} ({1}x{2})".format(name, cols, rows)
+    print(label.ljust(28), f"{per_led * 1000000:.1f} us".rjust(12), f"{whole_frame * 1000000:.1f} us".rjust(12))
@@ -8,7 +8,7 @@ class DummyMatrix(Backend.DeviceItem.Matrix):
     A simulated matrix that does absolutely nothing.
     """
     def __init__(self, *args):
-        pass
+        super().__init__()
 
     def set(self, x, y, r, g, b):
         pass
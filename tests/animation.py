@@ -0,0 +1,51 @@
+import unittest
+
+import numpy as np
+
+import polychromatic.animation as animation
+
+
+class TestAnimation(unittest.TestCase):
+    """
+    Test the easing curves and tweens used for animating effects.
+    """
+    def test_easing_endpoints(self):
+        for name in animation.EASINGS:
+            curve = animation.get_curve(name, 30)
+            self.assertAlmostEqual(float(curve[0]), 0, places=5, msg=f"{name} should start at 0")
+            self.assertAlmostEqual(float(curve[-1]), 1, places=5, msg=f"{name} should end at 1")
+
+    def test_easing_symmetry(self):
+        curve = animation.get_curve("cubic_in_out", 101)
+        self.assertAlmostEqual(float(curve[50]), 0.5, places=5)
+        self.assertLess(float(curve[25]), 0.25, "Curve should ease in")
+
+    def test_curve_cached(self):
+        curve = animation.get_curve("sine_in", 60)
+        self.assertIs(animation.get_curve("sine_in", 60), curve, "Curve was not cached")
+        self.assertFalse(curve.flags.writeable, "Cached curve should not be modifiable")
+
+    def test_frame_count(self):
+        self.assertEqual(animation.get_frame_count(2, 30), 61)
+        self.assertEqual(animation.get_frame_count(0, 30), 1)
+
+    def test_tween_frames(self):
+        tween = animation.Tween(np.zeros((6, 22, 3)), [200, 100, 0], 1, 10)
+        self.assertEqual(tween.get_frame(0).shape, (6, 22, 3))
+        self.assertEqual(tween.get_frame(0)[0, 0].tolist(), [0, 0, 0])
+        self.assertEqual(tween.get_frame(5)[5, 21].tolist(), [100, 50, 0], "Tween was not halfway")
+        self.assertEqual(tween.get_frame(50)[0, 0].tolist(), [200, 100, 0], "Tween should stay on the last frame")
+        self.assertTrue(tween.is_finished(10))
+
+    def test_tween_repeat(self):
+        loop = animation.Tween([0, 0, 0], [100, 100, 100], 1, 10, repeat=animation.REPEAT_LOOP)
+        self.assertEqual(loop.get_frame(11).tolist(), [0, 0, 0], "Tween did not loop")
+
+        reverse = animation.Tween([0, 0, 0], [100, 100, 100], 1, 10, repeat=animation.REPEAT_REVERSE)
+        self.assertEqual(reverse.get_frame(12).tolist(), [80, 80, 80], "Tween did not play backwards")
+        self.assertEqual(reverse.get_frame(20).tolist(), [0, 0, 0])
+        self.assertFalse(reverse.is_finished(100))
+
+    def test_tween_once(self):
+        self.assertEqual(animation.tween([0, 0, 0], [255, 255, 255], 0.5).tolist(), [128, 128, 128])
+        self.assertEqual(animation.tween([0, 0, 0], [255, 0, 0], 2).tolist(), [255, 0, 0], "Progress should not go beyond the end")
@@ -1,6 +1,36 @@
+import json
+import os
+import tempfile
 import unittest
 
+import numpy as np
+
 import polychromatic.fx as fx
+from polychromatic.backends._backend import Backend, BackendHelpers, MatrixRemap
+
+
+class CountingMatrix(fx.FX):
+    """
+    A simulated 6x22 matrix that counts LEDs set and frames drawn.
+    """
+    def __init__(self):
+        super().__init__()
+        self.rows = 6
+        self.cols = 22
+        self.leds_set = 0
+        self.draws = 0
+        self.pixels = np.zeros((self.rows, self.cols, 3), dtype=np.uint8)
+
+    def set(self, x=0, y=0, red=255, green=255, blue=255):
+        self.leds_set += 1
+        self.pixels[y, x] = self.record_led(x, y, red, green, blue)
+
+    def draw(self):
+        self.draws += 1
+
+    def clear(self):
+        self.record_clear()
+        self.pixels[:] = 0
 
 
 class TestFX(unittest.TestCase):
@@ -51,6 +81,24 @@ class TestFX(unittest.TestCase):
         # Similar test to above
         self.assertEqual(self.fx.lightness_rgb([0, 0, 0], 0.5), [127, 127, 127], "Cannot set lightness of RGB value")
 
+    def test_batch_matches_scalar(self):
+        colours = [[64, 128, 64], [255, 0, 0], [79, 222, 108], [0, 0, 0], [255, 255, 255], [124, 29, 251]]
+        for amount in [-0.7, 0.3, 1]:
+            self.assertEqual(self.fx.saturate_array(colours, amount).tolist(), [self.fx.saturate_rgb(rgb, amount) for rgb in colours], "Batch saturate differs")
+            self.assertEqual(self.fx.hue_array(colours, amount).tolist(), [self.fx.hue_rgb(rgb, amount) for rgb in colours], "Batch hue differs")
+            self.assertEqual(self.fx.lightness_array(colours, amount).tolist(), [self.fx.lightness_rgb(rgb, amount) for rgb in colours], "Batch lightness differs")
+
+    def test_batch_amount_per_colour(self):
+        output = self.fx.hue_array([[255, 0, 0], [255, 0, 0]], np.array([0, 0.5]))
+        self.assertEqual(output.tolist(), [[255, 0, 0], [0, 255, 255]])
+
+    def test_batch_hsv(self):
+        frame = np.array([[[255, 128, 0], [10, 20, 30]]], dtype=np.uint8)
+        hsv = self.fx.rgb_to_hsv_array(frame)
+        self.assertEqual(hsv.shape, (1, 2, 3))
+        self.assertAlmostEqual(hsv[0, 0, 0], 30 / 360, places=2)
+        self.assertEqual(self.fx.hsv_to_rgb_array(hsv).tolist(), frame.tolist(), "HSV did not convert back to the same colours")
+
     def test_gradient_2_colours(self):
         # Gradient from black to white, across 10 steps. Midpoint should be grey.
         gradient = self.fx.gradient(["#000000", "#FFFFFF"], 3)
@@ -60,3 +108,176 @@ class TestFX(unittest.TestCase):
         # Gradient from black to white to black, across 10 steps. Midpoint should be white.
         gradient = self.fx.gradient(["#000000", "#FFFFFF", "#000000"], 6)
         self.assertEqual(gradient[2].upper(), "#FFFFFF", "Cannot verify gradient is accurate")
+
+    def test_gradient_array(self):
+        colours = ["#000000", "#FFFFFF", "#FF0000"]
+        lut = self.fx.gradient_array(colours, 10)
+        expected = [self.fx.hex_to_rgb(value) for value in self.fx.gradient(colours, 10)]
+        self.assertEqual(lut.tolist(), expected, "Gradient array differs from gradient()")
+        self.assertIs(self.fx.gradient_array(colours, 10), lut, "Gradient was not cached")
+        self.assertFalse(lut.flags.writeable, "Cached gradient should not be modifiable")
+
+    def test_gradient_cache_bounded(self):
+        for steps in range(2, fx.GRADIENT_CACHE_SIZE * 2 + 2):
+            self.fx.gradient(["#000000", "#FFFFFF"], steps)
+        self.assertLessEqual(fx._get_gradient.cache_info().currsize, fx.GRADIENT_CACHE_SIZE)
+
+    def test_update_skips_identical_frame(self):
+        matrix = CountingMatrix()
+        frame = [[[0, 255, 0]] * 22] * 6
+        self.assertTrue(matrix.update(frame))
+        self.assertFalse(matrix.update(frame), "Identical frame should not be drawn again")
+        self.assertEqual(matrix.draws, 1)
+        self.assertEqual(matrix.draws_skipped, 1)
+
+    def test_update_only_changed_leds(self):
+        matrix = CountingMatrix()
+        frame = [[[0, 0, 0] for x in range(0, 22)] for y in range(0, 6)]
+        matrix.update(frame)
+        self.assertEqual(matrix.leds_set, 132)
+        frame[2][5] = [255, 0, 0]
+        matrix.update(frame)
+        self.assertEqual(matrix.leds_set, 133, "Only the changed LED should be set")
+        self.assertEqual(matrix.draws, 2)
+
+    def test_update_after_clear(self):
+        matrix = CountingMatrix()
+        frame = np.full((6, 22, 3), 255, dtype=np.uint8)
+        matrix.update(frame)
+        matrix.clear()
+        frame[0, 0] = [0, 0, 0]
+        matrix.update(frame)
+        self.assertEqual(int(np.count_nonzero(matrix.pixels.any(axis=2))), 131, "Whole frame should be sent after clear()")
+
+    def test_update_after_set(self):
+        matrix = CountingMatrix()
+        frame = np.zeros((6, 22, 3), dtype=np.uint8)
+        matrix.update(frame)
+        matrix.set(1, 1, 255, 0, 0)
+        self.assertTrue(matrix.update(frame), "Frame should be sent again after set()")
+        self.assertEqual(matrix.pixels[1, 1].tolist(), [0, 0, 0])
+
+    def test_fill(self):
+        matrix = CountingMatrix()
+        matrix.fill(255, 0, 0)
+        self.assertEqual(matrix.leds_set, 132)
+        self.assertTrue((matrix.pixels == [255, 0, 0]).all(), "Not all LEDs were filled")
+
+    def test_set_row_and_col(self):
+        matrix = CountingMatrix()
+        matrix.set_row(2, [0, 255, 0])
+        matrix.set_col(3, [[x * 10, 0, 0] for x in range(0, 6)])
+        self.assertEqual(matrix.leds_set, 22 + 6)
+        self.assertEqual(matrix.pixels[2, 0].tolist(), [0, 255, 0])
+        self.assertEqual(matrix.pixels[5, 3].tolist(), [50, 0, 0], "Column colours were not set in order")
+
+    def test_set_region_clipped(self):
+        matrix = CountingMatrix()
+        matrix.set_region(20, 4, 5, 5, [0, 0, 255])
+        self.assertEqual(matrix.leds_set, 4, "LEDs outside the matrix should be ignored")
+        self.assertEqual(matrix.pixels[5, 21].tolist(), [0, 0, 255])
+
+    def test_blit_buffer(self):
+        matrix = CountingMatrix()
+        matrix.blit(bytes([1, 2, 3]) * 22, 0, 1)
+        self.assertEqual(matrix.leds_set, 22)
+        self.assertEqual(matrix.pixels[1, 21].tolist(), [1, 2, 3], "Buffer was not read as RGB rows")
+
+    def test_brightness(self):
+        matrix = CountingMatrix()
+        frame = np.full((6, 22, 3), 200, dtype=np.uint8)
+        matrix.brightness(50)
+        matrix.update(frame)
+        self.assertEqual(matrix.pixels[0, 0].tolist(), [100, 100, 100], "Brightness was not applied")
+        matrix.brightness(25)
+        self.assertTrue(matrix.update(frame), "Same frame should be drawn again at a new brightness")
+        self.assertEqual(matrix.pixels[5, 21].tolist(), [50, 50, 50])
+        matrix.brightness(100)
+        matrix.fill(200, 0, 0)
+        self.assertEqual(matrix.pixels[0, 0].tolist(), [200, 0, 0], "Full brightness should not change colours")
+
+    def test_brightness_set_draw(self):
+        # As used by scripted effects
+        matrix = CountingMatrix()
+        matrix.brightness(50)
+        matrix.set(3, 2, 200, 100, 0)
+        matrix.draw()
+        self.assertEqual(matrix.pixels[2, 3].tolist(), [100, 50, 0], "Brightness was not applied to set()")
+
+    def test_brightness_after_set_draw(self):
+        # Fading a frame drawn with set(), without setting the LEDs again
+        matrix = CountingMatrix()
+        matrix.set(3, 2, 200, 100, 0)
+        matrix.draw()
+        leds_set = matrix.leds_set
+        matrix.brightness(50)
+        matrix.draw()
+        self.assertEqual(matrix.pixels[2, 3].tolist(), [100, 50, 0], "Brightness was not applied to the drawn frame")
+        self.assertEqual(matrix.pixels[0, 0].tolist(), [0, 0, 0], "LEDs not set should stay off")
+        self.assertEqual(matrix.leds_set - leds_set, 6 * 22, "Frame should be sent again once")
+
+    def test_gamma(self):
+        matrix = CountingMatrix()
+        matrix.set_gamma(2.0)
+        matrix.fill(255, 128, 0)
+        self.assertEqual(matrix.pixels[0, 0].tolist(), [255, 64, 0], "Gamma was not applied")
+
+    def test_brightness_monochromatic(self):
+        matrix = CountingMatrix()
+        matrix.monochromatic = True
+        matrix.brightness(50)
+        matrix.fill(255, 200, 100)
+        self.assertEqual(matrix.pixels[0, 0].tolist(), [0, 100, 0], "Only green should be shown")
+
+    def test_blit_resets_update(self):
+        matrix = CountingMatrix()
+        frame = np.zeros((6, 22, 3), dtype=np.uint8)
+        matrix.update(frame)
+        matrix.fill(255, 255, 255)
+        self.assertTrue(matrix.update(frame), "Frame should be sent again after drawing over it")
+
+
+class TestMatrixRemap(unittest.TestCase):
+    """
+    Test remapping a virtual matrix to the physical LEDs of a device.
+    """
+    def test_stretch(self):
+        remap = MatrixRemap(1, 2, [[[0, 0], [0, 0], [1, 0], None]])
+        frame = remap.get_physical_frame([[[255, 0, 0], [0, 255, 0]]])
+        self.assertEqual(frame.tolist(), [[[255, 0, 0], [255, 0, 0], [0, 255, 0], [0, 0, 0]]], "Frame was not remapped")
+        self.assertEqual(remap.get_physical_leds(0, 0), [(0, 0), (1, 0)])
+        self.assertEqual(remap.get_physical_leds(1, 0), [(2, 0)])
+
+    def test_out_of_bounds(self):
+        with self.assertRaises(ValueError):
+            MatrixRemap(1, 2, [[[2, 0]]])
+        with self.assertRaises(ValueError):
+            MatrixRemap(1, 2, [[[-1, 0]]])
+        with self.assertRaises(ValueError):
+            MatrixRemap(1, 2, [[[0, 0], [1, 0]], [[0, 0]]])
+
+    def test_data_file(self):
+        helpers = BackendHelpers()
+        path = os.path.join(os.path.dirname(__file__), "..", "data", "devices", "openrazer-remaps.json")
+        remap = helpers.get_matrix_remap(path, "Razer DeathStalker Chroma", 1, 12)
+        self.assertEqual((remap.virtual_rows, remap.virtual_cols), (1, 6))
+        self.assertEqual(remap.get_physical_leds(5, 0), [(10, 0), (11, 0)])
+        self.assertIsNone(helpers.get_matrix_remap(path, "Razer DeathStalker Chroma", 1, 6), "Remap should only apply to the same physical size")
+        self.assertIsNone(helpers.get_matrix_remap(path, "Unknown Device", 1, 12))
+
+    def test_data_file_invalid(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "remaps.json")
+            with open(path, "w") as f:
+                json.dump({"Device": {"virtual_rows": 1, "virtual_cols": 1, "leds": [[[5, 0]]]}, "Other": {"leds": []}}, f)
+            with self.assertRaises(ValueError):
+                BackendHelpers().get_matrix_remap(path, "Device", 1, 1)
+            with self.assertRaises(ValueError):
+                BackendHelpers().get_matrix_remap(path, "Other", 1, 1)
+
+    def test_matrix_set_remap(self):
+        matrix = CountingMatrix()
+        matrix.rows, matrix.cols = 1, 4
+        remap = MatrixRemap(1, 2, [[[0, 0], [0, 0], [1, 0], [1, 0]]])
+        Backend.DeviceItem.Matrix.set_remap(matrix, remap)
+        self.assertEqual((matrix.rows, matrix.cols), (1, 2), "Matrix should present the virtual size")
@@ -0,0 +1,156 @@
+import importlib.machinery
+import importlib.util
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import polychromatic.common as common
+import polychromatic.effects as effects
+import polychromatic.procpid as procpid
+from polychromatic.backends._backend import Backend
+
+# The helper is an executable script, not a module
+_loader = importlib.machinery.SourceFileLoader("polychromatic_helper", os.path.join(os.path.dirname(__file__), "..", "polychromatic-helper"))
+helper = importlib.util.module_from_spec(importlib.util.spec_from_loader(_loader.name, _loader))
+_loader.exec_module(helper)
+
+
+class FakeMatrix(Backend.DeviceItem.Matrix):
+    """
+    A simulated 1x2 matrix.
+    """
+    def __init__(self):
+        super().__init__()
+        self.rows = 1
+        self.cols = 2
+
+    def set(self, x=0, y=0, red=255, green=255, blue=255):
+        pass
+
+    def draw(self):
+        pass
+
+    def clear(self):
+        pass
+
+
+class FakeMiddleman(object):
+    """
+    Returns a new device for each lookup, like the real middleman.
+    """
+    def __init__(self, serials):
+        self.serials = serials
+
+    def get_device_by_serial(self, serial):
+        if serial not in self.serials:
+            return None
+        device = Backend.DeviceItem()
+        device.name = "Device " + serial
+        device.serial = serial
+        device.matrix = FakeMatrix()
+        return device
+
+    def get_device_by_name(self, name):
+        for serial in self.serials:
+            if name == "Device " + serial:
+                return self.get_device_by_serial(serial)
+        return None
+
+
+class TestEffectHelper(unittest.TestCase):
+    """
+    Test the effects helper plays, switches and stops effects for each device.
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.patches = [
+            mock.patch.object(common.paths, "pid_dir", os.path.join(self.tmp.name, "pid")),
+            mock.patch.object(common.paths, "states", self.tmp.name),
+            mock.patch.object(procpid.ProcessManager, "_is_polychromatic_process", return_value=True),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+        self.fx_helper = helper.EffectHelper(FakeMiddleman(["XX0001", "XX0002"]))
+        self.path = self._write_static_effect()
+
+    def tearDown(self):
+        with self.fx_helper.players_lock:
+            for serial in list(self.fx_helper.players.keys()):
+                self.fx_helper._stop_device(serial)
+        for patch in self.patches:
+            patch.stop()
+        self.tmp.cleanup()
+
+    def _write_static_effect(self):
+        """
+        Write a sequence effect that doesn't change, so it plays until stopped.
+        """
+        data = effects.EffectFileManagement().init_data("Test", effects.TYPE_SEQUENCE)
+        data["frames"] = [{"0": {"0": "#FF0000"}}]
+        data["loop"] = True
+        path = os.path.join(self.tmp.name, "test.json")
+        with open(path, "w") as f:
+            json.dump(data, f)
+        return path
+
+    def test_missing_field(self):
+        reply = self.fx_helper.handle_command({"command": "set_parameter", "serial": "XX0001", "var": "speed"})
+        self.assertFalse(reply["ok"])
+        self.assertIn("'value'", reply["error"])
+
+    def test_play_and_stop(self):
+        reply = self.fx_helper.handle_command({"command": "play", "path": self.path, "serials": ["XX0001", "XX0002"]})
+        self.assertEqual(reply, {"ok": True, "serials": ["XX0001", "XX0002"]})
+
+        status = self.fx_helper.handle_command({"command": "status"})
+        self.assertEqual(sorted([device["serial"] for device in status["devices"]]), ["XX0001", "XX0002"])
+        start_times = [player.start_time for player in self.fx_helper.players.values()]
+        self.assertEqual(start_times[0], start_times[1], "Devices should start together")
+
+        self.assertTrue(self.fx_helper.handle_command({"command": "stop", "serial": "XX0001"})["ok"])
+        self.assertEqual(list(self.fx_helper.players.keys()), ["XX0002"], "Device was not stopped")
+
+    def test_play_unknown_device(self):
+        reply = self.fx_helper.handle_command({"command": "play", "path": self.path, "serials": ["XX9999"]})
+        self.assertFalse(reply["ok"])
+        self.assertEqual(self.fx_helper.players, {})
+
+    def test_pause_and_resume(self):
+        self.fx_helper.handle_command({"command": "play", "path": self.path, "names": ["Device XX0001"]})
+        self.fx_helper.handle_command({"command": "pause", "serial": "XX0001"})
+        self.assertTrue(self.fx_helper.handle_command({"command": "status"})["devices"][0]["paused"])
+        self.fx_helper.handle_command({"command": "resume", "serial": "XX0001"})
+        self.assertFalse(self.fx_helper.handle_command({"command": "status"})["devices"][0]["paused"])
+
+    def test_reconcile_unassigned(self):
+        self.fx_helper.handle_command({"command": "play", "path": self.path, "serials": ["XX0001"]})
+        procpid.ProcessManager("XX0001").release_component_pid()
+        self.fx_helper.reconcile()
+        self.assertEqual(self.fx_helper.players, {}, "Device no longer assigned should be stopped")
+
+    def test_finish_device(self):
+        procpid.ProcessManager("XX0001").set_component_pid()
+        procpid.DeviceSoftwareState("XX0001").set_effect("Test", "", self.path)
+        player = helper.DevicePlayer((self.path, None), 0)
+        self.fx_helper.players["XX0001"] = player
+
+        self.fx_helper._finish_device("XX0001", player, failed=True)
+        self.assertNotIn("XX0001", self.fx_helper.players, "Failed device was not removed")
+        self.assertIsNone(procpid.ProcessManager("XX0001")._get_component_pid(), "Failed device was not released")
+        self.assertIsNone(procpid.DeviceSoftwareState("XX0001").get_effect(), "Failed effect was not cleared")
+
+    def test_stop_device_timeout(self):
+        player = helper.DevicePlayer((self.path, None), 0)
+        release = threading.Event()
+        player.thread = threading.Thread(target=release.wait, daemon=True)
+        player.thread.start()
+        self.fx_helper.players["XX0001"] = player
+
+        with mock.patch.object(helper, "STOP_TIMEOUT", 0.1):
+            self.fx_helper._stop_device("XX0001")
+        self.assertNotIn("XX0001", self.fx_helper.players, "Stuck device was not dropped")
+        release.set()
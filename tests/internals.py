@@ -119,8 +119,32 @@ class TestInternals(unittest.TestCase):
     def test_rgb_to_hex(self):
         self.assertEqual(common.rgb_to_hex([0, 255, 0]), "#00FF00", "Could not convert RGB to hex")
 
+    def test_rgb_to_hex_out_of_range(self):
+        with self.assertRaises(ValueError):
+            common.rgb_to_hex([-1, 0, 0])
+        with self.assertRaises(ValueError):
+            common.rgb_to_hex([0, 256, 0])
+
     def test_hex_to_rgb(self):
         self.assertEqual(common.hex_to_rgb("#FF00FF"), [255, 0, 255], "Could not convert RGB to hex")
+        self.assertEqual(common.hex_to_rgb("#ff8040"), [255, 128, 64], "Could not convert lowercase hex to RGB")
+
+    def test_hex_to_rgb_invalid(self):
+        self.assertEqual(common.hex_to_rgb("#FF804080"), [255, 128, 64], "Alpha should be ignored")
+        with self.assertRaises(ValueError):
+            common.hex_to_rgb("#FF80")
+        with self.assertRaises(ValueError):
+            common.hex_to_rgb("#FFF")
+        with self.assertRaises(ValueError):
+            common.hex_to_rgb("#GG0000")
+
+    def test_hex_list_to_rgb_buffer(self):
+        self.assertEqual(common.hex_list_to_rgb_buffer(["#FF0000", "#00ff80"]), bytes([255, 0, 0, 0, 255, 128]))
+        with self.assertRaises(ValueError):
+            common.hex_list_to_rgb_buffer(["#FFF", "#FFF"])
+
+    def test_rgb_buffer_to_hex_list(self):
+        self.assertEqual(common.rgb_buffer_to_hex_list(bytes([255, 0, 0, 0, 255, 128])), ["#FF0000", "#00FF80"])
 
     def test_state_set_effect(self):
         state = procpid.DeviceSoftwareState("POLY000001")
@@ -5,9 +5,13 @@ import polychromatic.common as common
 import polychromatic.locales as locales
 import polychromatic.middleman as middleman
 import polychromatic.preferences as preferences
+from polychromatic.backends._backend import Backend
 
 import os
+import sys
+import types
 import unittest
+from unittest import mock
 
 
 class TestMiddleman(unittest.TestCase):
@@ -98,3 +102,90 @@ class TestMiddleman(unittest.TestCase):
         zone = device.zones[0]
         self.middleman.set_colour_for_active_effect_zone(zone, "#0000FF")
         self.assertEqual(expected_option.colours[0], "#0000FF")
+
+
+class StartingBackend(object):
+    """
+    A backend whose daemon becomes available after a number of attempts.
+    """
+    def __init__(self, notifies, attempts):
+        self.notifies = notifies
+        self.attempts = attempts
+        self.waits = 0
+
+    def wait_for_daemon(self, timeout):
+        self.waits += 1
+        return True if self.notifies else None
+
+    def init(self):
+        self.attempts -= 1
+        return True if self.attempts <= 0 else "Daemon not running"
+
+
+class TestMiddlemanStartup(unittest.TestCase):
+    """
+    Test waiting for backends to become available.
+    """
+    def test_wait_notified(self):
+        # Daemon isn't running when the middleman initialises the backend
+        backend = StartingBackend(notifies=True, attempts=2)
+        module = types.ModuleType("polychromatic.backends.openrazer")
+        module.OpenRazerBackend = lambda base: backend
+
+        mm = middleman.Middleman()
+        with mock.patch.dict(sys.modules, {"polychromatic.backends.openrazer": module}):
+            mm.init()
+        self.assertEqual(mm.backends, [], "Error from init() should not count as success")
+        self.assertEqual(mm.bad_init, [backend])
+
+        mm.wait_for_backends(1)
+        self.assertEqual(mm.backends, [backend], "Backend was not initialised again")
+        self.assertEqual(mm.bad_init, [])
+        self.assertEqual(backend.waits, 1)
+
+    def test_wait_notified_failed(self):
+        # Daemon is available, but the backend still can't use it
+        mm = middleman.Middleman()
+        backend = StartingBackend(notifies=True, attempts=5)
+        mm.bad_init.append(backend)
+        mm.wait_for_backends(1)
+        self.assertEqual(mm.bad_init, [backend])
+        self.assertEqual(backend.waits, 1, "Should not keep waiting for a daemon that is running")
+
+    def test_wait_polling(self):
+        mm = middleman.Middleman()
+        backend = StartingBackend(notifies=False, attempts=3)
+        mm.bad_init.append(backend)
+        mm.wait_for_backends(1, poll_interval=0.01)
+        self.assertEqual(mm.backends, [backend], "Backend was not retried")
+
+    def test_wait_timeout(self):
+        mm = middleman.Middleman()
+        backend = StartingBackend(notifies=False, attempts=1000)
+        mm.bad_init.append(backend)
+        mm.wait_for_backends(0.05, poll_interval=0.01)
+        self.assertEqual(mm.bad_init, [backend])
+
+
+class TestDeviceItem(unittest.TestCase):
+    """
+    Test attributes of a device can be created when they are first accessed.
+    """
+    def test_lazy_attribute(self):
+        calls = []
+        device = Backend.DeviceItem()
+        device.set_lazy("zones", lambda: calls.append(True) or ["main"])
+        self.assertEqual(calls, [], "Attribute was created before it was accessed")
+        self.assertEqual(device.zones, ["main"])
+        self.assertEqual(device.zones, ["main"])
+        self.assertEqual(len(calls), 1, "Attribute should only be created once")
+
+    def test_lazy_attribute_replaced(self):
+        device = Backend.DeviceItem()
+        device.set_lazy("battery", lambda: "lazy")
+        device.battery = None
+        self.assertIsNone(device.battery, "Setting the attribute should take priority")
+
+    def test_missing_attribute(self):
+        device = Backend.DeviceItem()
+        self.assertFalse(hasattr(device, "nonexistent"))
@@ -6,6 +6,7 @@
 #
 import os
 import random
+import types
 import unittest
 
 # Polychromatic Modules
@@ -14,6 +15,7 @@ from polychromatic.backends._backend import Backend
 from polychromatic.backends.openrazer import OpenRazerBackend, OpenRazerPersistence, OpenRazerPersistenceFallback
 
 # External
+from gi.repository import GLib
 import openrazer.client
 
 
@@ -91,6 +93,50 @@ class OpenRazerMiddlemanTest(unittest.TestCase):
     def test_get_devices(self):
         self.assertGreater(len(self.openrazer.get_devices()), 140, "Failed to get devices")
 
+    def test_hotplug_signals(self):
+        self.openrazer.init()
+        if not self.openrazer._signal_bus:
+            self.skipTest("Not listening for the daemon's signals")
+        total = len(self.openrazer.get_devices())
+
+        # Pretend a device was inserted after the list was last updated
+        rdevices = list(self.openrazer.rdevices)
+        inserted = self.openrazer.rdevices.pop()
+        self.openrazer._devices_changed = True  # Simulate the daemon's "device_added" signal
+        self.assertEqual(len(self.openrazer.get_devices()), total, "Inserted device was not added")
+        self.assertIsNot(self.openrazer.rdevices[-1], inserted, "Inserted device should be a new object")
+        for before, after in zip(rdevices[:-1], self.openrazer.rdevices):
+            self.assertIs(before, after, "Existing devices should not be created again")
+
+        # Pretend a device was removed after the list was last updated
+        self.openrazer.rdevices.append(types.SimpleNamespace(serial="XX0000000000", name="Removed Device"))
+        self.openrazer._devices_changed = True  # Simulate the daemon's "device_removed" signal
+        self.assertEqual(len(self.openrazer.get_devices()), total, "Removed device is still listed")
+
+    def test_hotplug_signals_in_main_loop(self):
+        self.openrazer.init()
+        if not self.openrazer._signal_bus:
+            self.skipTest("Not listening for the daemon's signals")
+
+        # Requesting devices from within a main loop shouldn't run its other sources
+        loop = GLib.MainLoop()
+        ran = []
+
+        def _other_source():
+            ran.append(True)
+            return False
+
+        def _get_devices():
+            GLib.idle_add(_other_source)
+            self.openrazer.get_devices()
+            ran.append(False)
+            loop.quit()
+            return False
+
+        GLib.idle_add(_get_devices)
+        loop.run()
+        self.assertEqual(ran[0], False, "Another source was run while requesting devices")
+
     def test_get_device_by_name(self):
         device = self.get_device("Razer BlackWidow Chroma")
         self.assertEqual(device.name, "Razer BlackWidow Chroma", "Failed to get a device by name")
@@ -100,6 +146,33 @@ class OpenRazerMiddlemanTest(unittest.TestCase):
         device = self.openrazer.get_device_by_serial("XX0000000203")
         self.assertIsNotNone(device, "Failed to get a device by serial")
 
+    def test_lazy_attribute_error(self):
+        device = self.get_device("Razer BlackWidow Chroma")
+
+        def _daemon_error():
+            raise RuntimeError("Daemon stopped responding")
+
+        self.openrazer._set_lazy(device, "zones", _daemon_error, [])
+        self.assertEqual(device.zones, [], "Daemon error should not be raised to the application")
+
+    def test_refresh_reads_options_once(self):
+        device = self.get_device("Razer Mamba Elite")
+        reads = []
+        get_zones = self.openrazer._get_zones_with_options
+
+        def _get_zones_with_options(rdevice, serial):
+            zones = get_zones(rdevice, serial)
+            for zone in zones:
+                for option in zone.options:
+                    refresh = option.refresh
+                    option.refresh = lambda refresh=refresh, option=option: reads.append(option.uid) or refresh()
+            return zones
+
+        self.openrazer._set_lazy(device, "zones", lambda: _get_zones_with_options(device._rdevice, device.serial), [])
+        device.refresh()
+        self.assertNotIn("poll_rate", reads, "Option read when created was read again")
+        self.assertIn("brightness", reads, "Options not read when created should be read")
+
     def test_device_dpi_max(self):
         device = self.get_device("Razer Mamba Elite")
         self.assertEqual(device.dpi.max, 16000, "Incorrect Max DPI")
@@ -153,6 +226,22 @@ class OpenRazerMiddlemanTest(unittest.TestCase):
         device.matrix.set(0, 0, 255, 0, 0)
         device.matrix.draw()
 
+    def test_device_matrix_set_frame(self):
+        device = self.get_device("Razer BlackWidow Chroma V2")
+        frame = [[[x * 10, y * 40, 0] for x in range(0, 22)] for y in range(0, 6)]
+        device.matrix.set_frame(frame)
+        client_frame = device.matrix._rdevice.fx.advanced.matrix
+        self.assertEqual(client_frame[5, 21], (210, 200, 0), "Frame was not written to the client's matrix")
+        device.matrix.draw()
+
+    def test_device_matrix_set_frame_deathstalker(self):
+        device = self.get_device("Razer DeathStalker Chroma")
+        device.matrix.set_frame([[[255, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 255, 0]]])
+        client_frame = device.matrix._rdevice.fx.advanced.matrix
+        self.assertEqual(client_frame[0, 1], (255, 0, 0), "Virtual LED was not stretched")
+        self.assertEqual(client_frame[0, 10], (0, 255, 0), "Virtual LED was not stretched")
+        device.matrix.draw()
+
     def test_device_matrix_name(self):
         device = self.get_device("Razer BlackWidow Ultimate 2016")
         self.assertEqual(device.matrix.name, "Razer BlackWidow Ultimate 2016")
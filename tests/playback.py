@@ -0,0 +1,407 @@
+import glob
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from _dummy import DummyMatrix as DummyMatrix
+
+import polychromatic.animation as animation
+import polychromatic.effects as effects
+import polychromatic.fileman as fileman
+import polychromatic.fx as fx
+import polychromatic.playback as playback
+
+
+class TestPlayback(unittest.TestCase):
+    """
+    Test the preparation of software effects for the helper to play.
+    """
+    @classmethod
+    def setUpClass(self):
+        pass
+
+    @classmethod
+    def tearDownClass(self):
+        pass
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_compile_sequence_shape(self):
+        frames = [{}, {}, {}]
+        buffers = playback.compile_sequence(frames, 6, 22)
+        self.assertEqual(buffers.shape, (3, 6, 22, 3), "Compiled frames have the wrong dimensions")
+
+    def test_compile_sequence_colours(self):
+        frames = [{"2": {"1": "#FF8040"}}, {"0": {"0": "#00FF00"}}]
+        buffers = playback.compile_sequence(frames, 6, 22)
+        self.assertEqual(buffers[0, 1, 2].tolist(), [255, 128, 64], "Compiled frame has the wrong colour")
+        self.assertEqual(buffers[0, 0, 0].tolist(), [0, 0, 0], "Unset LED should be off")
+        self.assertEqual(buffers[1, 0, 0].tolist(), [0, 255, 0], "Compiled frame has the wrong colour")
+
+    def test_compile_sequence_out_of_bounds(self):
+        frames = [{"30": {"0": "#FFFFFF"}, "0": {"9": "#FFFFFF"}}]
+        buffers = playback.compile_sequence(frames, 6, 22)
+        self.assertEqual(int(buffers.sum()), 0, "LEDs outside the matrix should be ignored")
+
+    def test_static_sequence(self):
+        frames = playback.compile_sequence([{"0": {"0": "#FF0000"}}, {"0": {"0": "#FF0000"}}], 6, 22)
+        self.assertTrue(playback.is_static_sequence(frames), "Identical frames should be static")
+        self.assertTrue(playback.is_static_sequence(frames[:1]), "A single frame should be static")
+
+        frames = playback.compile_sequence([{"0": {"0": "#FF0000"}}, {}], 6, 22)
+        self.assertFalse(playback.is_static_sequence(frames))
+
+    def test_interpolate_frames(self):
+        frames = playback.compile_sequence([{"0": {"0": "#000000"}}, {"0": {"0": "#C8FF64"}}], 1, 1)
+        interpolator = playback.SequenceInterpolator(frames, looped=False)
+        self.assertEqual(interpolator.render(0)[0, 0].tolist(), [0, 0, 0])
+        self.assertEqual(interpolator.render(0.5)[0, 0].tolist(), [100, 128, 50], "Frames were not blended halfway")
+        self.assertEqual(interpolator.render(1)[0, 0].tolist(), [200, 255, 100])
+        self.assertEqual(interpolator.render(1.5)[0, 0].tolist(), [200, 255, 100], "Last frame should not fade out")
+
+    def test_interpolate_looped(self):
+        frames = playback.compile_sequence([{"0": {"0": "#000000"}}, {"0": {"0": "#FFFFFF"}}], 1, 1)
+        interpolator = playback.SequenceInterpolator(frames, looped=True)
+        self.assertEqual(interpolator.render(1.75)[0, 0].tolist(), [64, 64, 64], "Last frame should fade into the first")
+
+    def _get_fake_clock(self):
+        """
+        Returns a clock and sleep function that only advance when told to.
+        """
+        now = [100.0]
+
+        def clock():
+            return now[0]
+
+        def sleep(seconds):
+            now[0] += seconds
+
+        return now, clock, sleep
+
+    def test_scheduler_on_time(self):
+        now, clock, sleep = self._get_fake_clock()
+        scheduler = playback.FrameScheduler(10, clock=clock, sleep=sleep)
+        frames = [scheduler.next_frame() for i in range(0, 5)]
+        self.assertEqual(frames, [0, 1, 2, 3, 4], "Scheduler did not play frames in order")
+        self.assertAlmostEqual(now[0], 100.4, msg="Scheduler drifted from frame deadlines")
+        self.assertEqual(scheduler.frames_missed, 0)
+
+    def test_scheduler_no_drift(self):
+        # Time spent drawing should not add to the frame period
+        now, clock, sleep = self._get_fake_clock()
+        scheduler = playback.FrameScheduler(10, clock=clock, sleep=sleep)
+        for i in range(0, 10):
+            scheduler.next_frame()
+            now[0] += 0.05
+        self.assertAlmostEqual(now[0], 100.95, msg="Scheduler drifted from frame deadlines")
+        self.assertEqual(scheduler.frames_missed, 0)
+
+    def test_scheduler_skip_late_frames(self):
+        now, clock, sleep = self._get_fake_clock()
+        scheduler = playback.FrameScheduler(10, playback.SCHEDULE_SKIP, clock=clock, sleep=sleep)
+        scheduler.next_frame()
+        now[0] += 0.35
+        self.assertEqual(scheduler.next_frame(), 3, "Scheduler did not skip late frames")
+        self.assertEqual(scheduler.frames_missed, 2)
+
+    def test_scheduler_delay_late_frames(self):
+        now, clock, sleep = self._get_fake_clock()
+        scheduler = playback.FrameScheduler(10, playback.SCHEDULE_DELAY, clock=clock, sleep=sleep)
+        scheduler.next_frame()
+        now[0] += 0.35
+        self.assertEqual(scheduler.next_frame(), 1, "Scheduler should not skip frames")
+        self.assertEqual(scheduler.frames_missed, 2)
+        scheduler.next_frame()
+        self.assertAlmostEqual(now[0], 100.45, msg="Scheduler did not delay the following frames")
+
+    def test_scheduler_shared_start(self):
+        now, clock, sleep = self._get_fake_clock()
+        scheduler = playback.FrameScheduler(10, clock=clock, sleep=sleep)
+        scheduler.start(100.2)
+        self.assertEqual(scheduler.next_frame(), 0)
+        self.assertAlmostEqual(now[0], 100.2, msg="Scheduler did not wait for the start time")
+
+    def test_scheduler_join_started(self):
+        # Joining a timeline in progress should play the frame due now
+        now, clock, sleep = self._get_fake_clock()
+        scheduler = playback.FrameScheduler(10, clock=clock, sleep=sleep)
+        scheduler.start(99.45)
+        self.assertEqual(scheduler.next_frame(), 5, "Scheduler did not join at the current frame")
+        self.assertEqual(scheduler.frames_missed, 0, "Joining should not count as missed frames")
+        self.assertEqual(scheduler.next_frame(), 6)
+        self.assertAlmostEqual(now[0], 100.05)
+
+    def test_scheduler_slack(self):
+        now, clock, sleep = self._get_fake_clock()
+        scheduler = playback.FrameScheduler(10, clock=clock, sleep=sleep)
+        scheduler.next_frame()
+        now[0] += 0.03
+        scheduler.next_frame()
+        self.assertAlmostEqual(scheduler.slack, 0.07, msg="Slack should be the time left before the frame was due")
+        now[0] += 0.15
+        scheduler.next_frame()
+        self.assertAlmostEqual(scheduler.slack, -0.05, msg="Slack should be negative when late")
+
+    def test_scheduler_set_fps(self):
+        # Changing the rate should not move the timeline
+        now, clock, sleep = self._get_fake_clock()
+        scheduler = playback.FrameScheduler(10, clock=clock, sleep=sleep)
+        for i in range(0, 5):
+            scheduler.next_frame()
+        scheduler.set_fps(20)
+        tick = scheduler.next_frame()
+        self.assertAlmostEqual(tick / scheduler.fps, now[0] - 100, msg="Frame time does not match the timeline")
+        self.assertEqual(scheduler.frames_missed, 0)
+
+    def test_adaptive_rate_throttle(self):
+        rate = playback.AdaptiveRate(30)
+        changes = [rate.add_draw(0.05) for i in range(0, playback.THROTTLE_FRAMES)]
+        self.assertEqual(changes[-1], 15, "Rate should lower to fit 50ms draws within the budget")
+        self.assertEqual(changes.count(None), playback.THROTTLE_FRAMES - 1, "Rate should only change once")
+
+    def test_adaptive_rate_recover(self):
+        rate = playback.AdaptiveRate(30)
+        for i in range(0, playback.THROTTLE_FRAMES):
+            rate.add_draw(0.05)
+        changes = [rate.add_draw(0.001) for i in range(0, 400)]
+        self.assertEqual([fps for fps in changes if fps], [19, 24, 30], "Rate should recover in steps to the target")
+
+    def test_adaptive_rate_minimum(self):
+        rate = playback.AdaptiveRate(30)
+        for i in range(0, playback.THROTTLE_FRAMES * 3):
+            rate.add_draw(1)
+        self.assertEqual(rate.fps, playback.THROTTLE_MIN_FPS)
+
+    def test_stats_summary(self):
+        stats = playback.PlaybackStats(10, window=4)
+        for frame in range(0, 6):
+            stats.add_frame(0.001, 0.02, -0.01 if frame == 5 else 0.07, 100 + (frame * 0.1), 1, frame != 2)
+        summary = stats.get_summary()
+        self.assertEqual(summary["frames"], 6)
+        self.assertEqual(summary["frames_dropped"], 1)
+        self.assertEqual(summary["draws_skipped"], 1)
+        self.assertAlmostEqual(summary["fps_actual"], 10, msg="Measured frame rate is wrong")
+        self.assertAlmostEqual(summary["draw"]["mean_ms"], 20)
+        self.assertEqual(sum(summary["build"]["histogram"]), 4, "Histogram should only count recent frames")
+        self.assertEqual(summary["slack"]["histogram"][0], 1, "Late frame was not counted")
+        self.assertEqual(summary["draw"]["histogram"][playback.STATS_BUCKETS_MS.index(10) + 1], 4, "Draw time is in the wrong bucket")
+
+    def test_scheduler_resume(self):
+        now, clock, sleep = self._get_fake_clock()
+        scheduler = playback.FrameScheduler(10, clock=clock, sleep=sleep)
+        scheduler.next_frame()
+        now[0] += 5
+        scheduler.resume()
+        self.assertEqual(scheduler.next_frame(), 1, "Scheduler did not continue from the paused frame")
+        self.assertEqual(scheduler.frames_missed, 0, "Pausing should not count as missed frames")
+
+    def test_layered_static(self):
+        layers = [{"name": "1", "type": effects.LAYER_STATIC, "positions": [[0, 0], [3, 2], [50, 50]], "properties": {"colour": "#FF0000"}}]
+        renderer = playback.LayeredRenderer(layers, 6, 22)
+        frame = renderer.render(0)
+        self.assertEqual(frame[0, 0].tolist(), [255, 0, 0], "Static layer was not rendered")
+        self.assertEqual(frame[2, 3].tolist(), [255, 0, 0], "Static layer was not rendered")
+        self.assertEqual(frame[1, 1].tolist(), [0, 0, 0], "LED outside layer should be off")
+        self.assertTrue(renderer.is_static)
+
+    def test_layered_blending_order(self):
+        layers = [
+            {"name": "1", "type": effects.LAYER_STATIC, "positions": [[0, 0], [1, 0]], "properties": {"colour": "#FF0000"}},
+            {"name": "2", "type": effects.LAYER_STATIC, "positions": [[1, 0]], "properties": {"colour": "#0000FF", "opacity": 0.5}},
+        ]
+        frame = playback.LayeredRenderer(layers, 1, 2).render(0)
+        self.assertEqual(frame[0, 0].tolist(), [255, 0, 0])
+        self.assertEqual(frame[0, 1].tolist(), [128, 0, 128], "Layers were not blended in order")
+
+    def test_layered_gradient(self):
+        positions = [[x, 0] for x in range(0, 5)]
+        layers = [{"name": "1", "type": effects.LAYER_GRADIENT, "positions": positions, "properties": {"colours": ["#000000", "#FFFFFF"]}}]
+        frame = playback.LayeredRenderer(layers, 1, 5).render(0)
+        self.assertEqual(frame[0, 0].tolist(), [0, 0, 0], "Gradient should start with the first colour")
+        self.assertEqual(frame[0, 4].tolist(), [255, 255, 255], "Gradient should end with the last colour")
+
+    def test_layered_gradient_matches_fx(self):
+        colours = ["#FF0000", "#00FF00", "#0000FF"]
+        positions = [[x, 0] for x in range(0, 22)]
+        layers = [{"name": "1", "type": effects.LAYER_GRADIENT, "positions": positions, "properties": {"colours": colours}}]
+        frame = playback.LayeredRenderer(layers, 1, 22).render(0)
+        lut = fx.get_gradient_array(colours, playback.LUT_SIZE)
+        expected = lut[((np.arange(0, 22) / 21).astype(np.float32) * (len(lut) - 1)).astype(np.intp)]
+        self.assertEqual(frame[0].tolist(), expected.tolist(), "Gradient layer should match FX.gradient_array()")
+
+    def test_layered_pulsing(self):
+        layers = [{"name": "1", "type": effects.LAYER_PULSING, "positions": [[0, 0]], "properties": {"colour": "#00FF00", "speed": 2}}]
+        renderer = playback.LayeredRenderer(layers, 1, 1)
+        self.assertFalse(renderer.is_static)
+        self.assertEqual(renderer.render(0)[0, 0].tolist(), [0, 0, 0])
+        self.assertEqual(renderer.render(1)[0, 0].tolist(), [0, 255, 0], "Pulse should peak halfway through the cycle")
+
+    def test_layered_easing(self):
+        layers = [
+            {"name": "1", "type": effects.LAYER_CYCLE, "positions": [[0, 0]], "properties": {"colours": ["#000000", "#FFFFFF"], "speed": 2}},
+            {"name": "2", "type": effects.LAYER_CYCLE, "positions": [[1, 0]], "properties": {"colours": ["#000000", "#FFFFFF"], "speed": 2, "easing": "cubic_in"}},
+            {"name": "3", "type": effects.LAYER_PULSING, "positions": [[2, 0]], "properties": {"colour": "#FFFFFF", "speed": 4, "easing": "unknown"}},
+        ]
+        frame = playback.LayeredRenderer(layers, 1, 3).render(1)
+        self.assertAlmostEqual(frame[0, 0, 0], 127, delta=1, msg="Cycle should blend linearly by default")
+        self.assertLess(frame[0, 1, 0], 64, "Easing was not applied to the cycle")
+        self.assertAlmostEqual(frame[0, 2, 0], 127, delta=1, msg="Unknown easing should use the default curve")
+
+    def test_layered_no_colours(self):
+        layers = [
+            {"name": "1", "type": effects.LAYER_GRADIENT, "positions": [[0, 0]], "properties": {"colours": []}},
+            {"name": "2", "type": effects.LAYER_WAVE, "positions": [[1, 0]], "properties": {"colours": []}},
+            {"name": "3", "type": effects.LAYER_CYCLE, "positions": [[2, 0]], "properties": {"colours": []}},
+        ]
+        frame = playback.LayeredRenderer(layers, 1, 3).render(0)
+        self.assertEqual(frame[0, 0].tolist(), [0, 255, 0], "Gradient without colours should use the default colours")
+        self.assertEqual(frame[0, 2].tolist(), [255, 0, 0], "Cycle without colours should use the default colours")
+
+    def test_layered_unsupported(self):
+        layers = [{"name": "1", "type": effects.LAYER_SCRIPT, "positions": [[0, 0]], "properties": {}}]
+        renderer = playback.LayeredRenderer(layers, 1, 1)
+        self.assertEqual(len(renderer.unsupported_layers), 1)
+
+    def _write_script(self, source):
+        """
+        Write a temporary effect script and return its path.
+        """
+        fd, path = tempfile.mkstemp(suffix=".py")
+        with os.fdopen(fd, "w") as f:
+            f.write(source)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_scripted_globals(self):
+        path = self._write_script("FPS = 15\nframes = []\ndef on_frame(frame):\n    frames.append((frame, fx, speed))\n")
+        matrix = DummyMatrix()
+        runtime = playback.ScriptedRuntime(path, matrix, [{"var": "speed", "value": 3}])
+        runtime.run_frame()
+        runtime.run_frame()
+        self.assertEqual(runtime.fps, 15, "Script did not set its frame rate")
+        self.assertEqual(runtime.namespace["frames"], [(0, matrix, 3), (1, matrix, 3)], "Script did not receive fx object or parameters")
+
+    def test_scripted_animation(self):
+        path = self._write_script("fade = animation.Tween([0, 0, 0], [255, 0, 0], 1, FPS)\ndef on_frame(frame):\n    fx.set(0, 0, *fade.get_frame(frame).tolist())\n")
+        runtime = playback.ScriptedRuntime(path, DummyMatrix(), [])
+        self.assertIs(runtime.namespace["animation"], animation, "Script did not receive the animation module")
+        self.assertEqual(runtime.namespace["fade"].frames, playback.SCRIPTED_FPS + 1)
+
+    def test_scripted_scheduler_frame(self):
+        path = self._write_script("frames = []\ndef on_frame(frame):\n    frames.append(frame)\n")
+        runtime = playback.ScriptedRuntime(path, DummyMatrix(), [])
+        runtime.run_frame(0)
+        runtime.run_frame(3)
+        runtime.run_frame()
+        self.assertEqual(runtime.namespace["frames"], [0, 3, 4], "Script should receive the scheduler's frame number")
+
+    def test_scripted_set_parameter(self):
+        path = self._write_script("values = []\ndef on_frame(frame):\n    values.append(speed)\n")
+        runtime = playback.ScriptedRuntime(path, DummyMatrix(), [{"var": "speed", "value": 3}])
+        runtime.run_frame()
+        self.assertTrue(runtime.set_parameter("speed", 5))
+        self.assertFalse(runtime.set_parameter("unknown", 1), "Only the effect's parameters should be changed")
+        runtime.run_frame()
+        self.assertEqual(runtime.namespace["values"], [3, 5], "Script did not see the new parameter value")
+
+    def test_scripted_missing_hook(self):
+        path = self._write_script("x = 1\n")
+        with self.assertRaises(AttributeError):
+            playback.ScriptedRuntime(path, DummyMatrix(), [])
+
+    def test_scripted_within_budget(self):
+        path = self._write_script("def on_frame(frame):\n    fx.set(0, 0, 255, 0, 0)\n")
+        now, clock, sleep = self._get_fake_clock()
+        runtime = playback.ScriptedRuntime(path, DummyMatrix(), [], clock=clock)
+        for i in range(0, 30):
+            self.assertFalse(runtime.run_frame(), "Fast script should not be throttled")
+        self.assertEqual(runtime.fps, playback.SCRIPTED_FPS)
+
+    def test_scripted_over_budget(self):
+        # Each frame takes 50ms, which only fits the budget at 10 FPS
+        path = self._write_script("def on_frame(frame):\n    sleep(0.05)\n")
+        now, clock, sleep = self._get_fake_clock()
+        runtime = playback.ScriptedRuntime(path, DummyMatrix(), [{"var": "sleep", "value": sleep}], clock=clock)
+        throttled = [runtime.run_frame() for i in range(0, playback.SCRIPT_BUDGET_STRIKES)]
+        self.assertEqual(throttled.count(True), 1, "Slow script was not throttled")
+        self.assertEqual(runtime.fps, 10, "Frame rate was not lowered to fit the budget")
+        self.assertFalse(runtime.run_frame(), "Script should now be within its budget")
+
+    def _write_sequence(self, directory, frames):
+        """
+        Write a sequence effect and return its path.
+        """
+        data = effects.EffectFileManagement().init_data("Test", effects.TYPE_SEQUENCE)
+        data["frames"] = frames
+        path = os.path.join(directory, "test.json")
+        with open(path, "w") as f:
+            json.dump(data, f)
+        return path
+
+    def test_cache_sequence(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = playback.EffectCache(tmp)
+            path = self._write_sequence(tmp, [{"1": {"0": "#FF0000"}}])
+
+            data, frames = cache.load(path, 6, 22)
+            self.assertNotIn("frames", data, "Frames should be stored as a buffer")
+            self.assertEqual(frames[0, 0, 1].tolist(), [255, 0, 0])
+
+            data, frames = cache.load(path, 6, 22)
+            self.assertIsInstance(frames, np.memmap, "Cached frames were not memory mapped")
+            self.assertEqual(frames[0, 0, 1].tolist(), [255, 0, 0], "Cached frames differ")
+            self.assertEqual(data["parsed"]["path"], path)
+
+    def test_cache_without_parsed_keys(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = playback.EffectCache(tmp)
+            path = self._write_sequence(tmp, [{"1": {"0": "#FF0000"}}])
+            self.assertIn("parsed", cache.load(path, 6, 22)[0])
+
+            with open(glob.glob(os.path.join(tmp, "*-*.json"))[0], "r") as f:
+                self.assertNotIn("parsed", json.load(f), "Localised keys should not be cached")
+            self.assertEqual(cache.load(path, 6, 22)[0]["parsed"]["name"], "Test", "Parsed keys were not added when loaded")
+
+    def test_cache_invalidated(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = playback.EffectCache(tmp)
+            path = self._write_sequence(tmp, [{"1": {"0": "#FF0000"}}])
+            cache.load(path, 6, 22)
+
+            self._write_sequence(tmp, [{"1": {"0": "#0000FF"}}, {}])
+            os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1000000))
+            data, frames = cache.load(path, 6, 22)
+            self.assertEqual(len(frames), 2, "Changed effect was not compiled again")
+            self.assertEqual(frames[0, 0, 1].tolist(), [0, 0, 255])
+            self.assertEqual(len(glob.glob(os.path.join(tmp, "*.npy"))), 1, "Old cache entry was not removed")
+
+    def test_cache_purge(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = playback.EffectCache(tmp)
+            path = self._write_sequence(tmp, [{"1": {"0": "#FF0000"}}])
+            cache.load(path, 6, 22)
+            cache.load(path, 1, 2)
+            other_path = os.path.join(tmp, "other.json")
+            os.rename(self._write_sequence(tmp, [{}]), other_path)
+            cache.load(other_path, 6, 22)
+
+            cache.purge(path)
+            self.assertEqual(len(glob.glob(os.path.join(tmp, "*.npy"))), 1, "Cache entries for the effect were not removed")
+            self.assertEqual(cache.load(other_path, 6, 22)[1].shape, (1, 6, 22, 3), "Other effects should stay cached")
+
+    def test_cache_unusable(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = self._write_sequence(tmp, [{"1": {"0": "#FF0000"}}])
+            data, frames = playback.EffectCache(path).load(path, 6, 22)
+            self.assertEqual(frames[0, 0, 1].tolist(), [255, 0, 0], "Effect should load when it can't be cached")
+
+    def test_cache_missing_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            data, buffer = playback.EffectCache(tmp).load(os.path.join(tmp, "missing.json"), 6, 22)
+            self.assertEqual(data, fileman.ERROR_MISSING_FILE)
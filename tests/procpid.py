@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+
+import polychromatic.procpid as procpid
+
+
+class TestProcPID(unittest.TestCase):
+    """
+    Test communication between Polychromatic processes.
+    """
+    @classmethod
+    def setUpClass(self):
+        pass
+
+    @classmethod
+    def tearDownClass(self):
+        pass
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmp.name, "test.sock")
+        self.requests = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _handler(self, request):
+        self.requests.append(request)
+        if request["command"] == "status":
+            return {"ok": True, "devices": [{"serial": "XX0000", "path": "/tmp/test.json", "paused": False}]}
+        if request["command"] == "fail":
+            raise ValueError("Bad request")
+        return {"ok": True}
+
+    def test_control_socket(self):
+        server = procpid.ControlServer(self.socket_path, self._handler)
+        server.start()
+        client = procpid.EffectHelperClient(self.socket_path)
+
+        self.assertEqual(client.play("/tmp/test.json", ["XX0000"]), {"ok": True})
+        self.assertEqual(self.requests[0], {"command": "play", "path": "/tmp/test.json", "serials": ["XX0000"], "names": []})
+        self.assertEqual(client.get_status()["devices"][0]["serial"], "XX0000")
+
+        reply = client._send({"command": "fail"})
+        self.assertFalse(reply["ok"], "Exceptions should be replied to as errors")
+        self.assertEqual(reply["error"], "Bad request")
+
+        server.close()
+        self.assertFalse(os.path.exists(self.socket_path), "Socket was not removed")
+
+    def test_control_socket_not_running(self):
+        client = procpid.EffectHelperClient(self.socket_path)
+        self.assertIsNone(client.stop("XX0000"), "Should return None when not running")
@@ -6,18 +6,26 @@
 import sys
 import unittest
 
+import animation
 import internals
 import effects
 import fx
+import helper
 import middleman
+import playback
+import procpid
 
 loader = unittest.TestLoader()
 suite  = unittest.TestSuite()
 
+suite.addTests(loader.loadTestsFromModule(animation))
 suite.addTests(loader.loadTestsFromModule(internals))
 suite.addTests(loader.loadTestsFromModule(effects))
 suite.addTests(loader.loadTestsFromModule(fx))
+suite.addTests(loader.loadTestsFromModule(helper))
 suite.addTests(loader.loadTestsFromModule(middleman))
+suite.addTests(loader.loadTestsFromModule(playback))
+suite.addTests(loader.loadTestsFromModule(procpid))
 
 # Initialize runner
 runner = unittest.TextTestRunner()